@@ -1,18 +1,27 @@
 # pyrefly: ignore [missing-import]
 import streamlit as st
 import os
+import asyncio
 # pyrefly: ignore [missing-import]
 from dotenv import load_dotenv
-# pyrefly: ignore [missing-import]
-from llm_engine import LLMEngine
-# pyrefly: ignore [missing-import]
-from diagram_gen import execute_diagram_code
+
+# llm_engine (openai) and diagram_gen are imported lazily inside functions
+# so page loads and reruns don't pay for them. The render worker is started
+# by the first execute_diagram_code call.
 
 # Load environment variables
 load_dotenv()
 
 st.set_page_config(page_title="Arcgen - NL to System Design", layout="wide")
 
+
+@st.cache_resource
+def get_llm():
+    # Shared across reruns and sessions so the HTTP connection pool stays warm
+    # pyrefly: ignore [missing-import]
+    from llm_engine import get_engine
+    return get_engine()
+
 st.title("Arcgen: Natural Language to System Design Architecture")
 st.markdown("Describe your system architecture, and Arcgen will visualize it for you.")
 
@@ -37,12 +46,19 @@ if st.button("Generate Architecture", type="primary"):
     else:
         with st.spinner("Generating architecture..."):
             try:
+                # pyrefly: ignore [missing-import]
+                from diagram_gen import execute_diagram_code
+
                 # 1. Initialize LLM
-                llm = LLMEngine()
+                llm = get_llm()
                 
-                # 2. Generate Code
+                # 2. Generate Code (streamed so tokens appear as they arrive)
                 st.info("Consulting the Architect (LLM)...")
-                code = llm.generate_code(user_input)
+                code = llm.get_cached_code(user_input)
+                if code is None:
+                    with st.expander("Live LLM Output", expanded=True):
+                        raw = st.write_stream(llm.stream_code(user_input))
+                    code = llm.finalize_code(user_input, raw)
                 
                 # DEBUG: Show raw code for troubleshooting
                 print(f"DEBUG: Extracted Code:\n{code}")
@@ -67,3 +83,63 @@ if st.button("Generate Architecture", type="primary"):
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
 
+
+if st.button("Generate 3 Alternatives"):
+    if not user_input:
+        st.warning("Please enter a description first.")
+    elif not api_key:
+        st.error("API Key missing. Cannot generate.")
+    else:
+        # pyrefly: ignore [missing-import]
+        from diagram_gen import execute_diagram_code
+
+        # One request returns all variants, so the system prompt is only processed once
+        with st.spinner("Generating design alternatives..."):
+            variants = get_llm().generate_variants(user_input, n=3)
+
+        if not variants:
+            st.error("Failed to generate code. Please try again.")
+        for column, (i, code) in zip(st.columns(len(variants) or 1), enumerate(variants, 1)):
+            with column:
+                st.markdown(f"**Alternative {i}**")
+                try:
+                    st.image(execute_diagram_code(code), use_column_width=True)
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+                with st.expander("View Generated Python Code"):
+                    st.code(code, language="python")
+
+
+# Batch mode: several descriptions generated concurrently
+st.divider()
+st.subheader("Batch Generation")
+batch_input = st.text_area("Describe several systems, separated by a blank line:", height=200, key="batch_input")
+
+if st.button("Generate All"):
+    prompts = [p.strip() for p in batch_input.split("\n\n") if p.strip()]
+    if not prompts:
+        st.warning("Please enter at least one description.")
+    elif not api_key:
+        st.error("API Key missing. Cannot generate.")
+    else:
+        # pyrefly: ignore [missing-import]
+        from diagram_gen import execute_diagram_code
+
+        with st.spinner(f"Generating {len(prompts)} architectures..."):
+            llm = get_llm()
+            codes = asyncio.run(llm.batch_generate_code(prompts))
+
+        columns = st.columns(2)
+        for i, (prompt, code) in enumerate(zip(prompts, codes)):
+            with columns[i % 2]:
+                st.markdown(f"**{prompt[:80]}**")
+                if not code:
+                    st.error("Failed to generate code.")
+                    continue
+                try:
+                    image_path = execute_diagram_code(code)
+                    st.image(image_path, use_column_width=True)
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+                with st.expander("View Generated Python Code"):
+                    st.code(code, language="python")
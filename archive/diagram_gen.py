@@ -1,26 +1,186 @@
-import sys
-import io
 import os
-from contextlib import redirect_stdout
+import ast
+import hashlib
+import tempfile
+import threading
+import multiprocessing as mp
+
+try:
+    # pyrefly: ignore [missing-import]
+    import isort
+except ImportError:
+    isort = None
+
+CACHE_DIR = ".arcgen_cache"
+RENDER_TIMEOUT = 120  # seconds
+
+# (process, connection) for the persistent render worker
+_worker = None
+# Streamlit sessions run in their own threads but share the worker, so each
+# send/recv exchange must finish before the next one starts
+_worker_lock = threading.RLock()
+
+
+def _install_pygraphviz_renderer():
+    """
+    Makes Diagram.render lay out graphs in-process through libgraphviz instead
+    of spawning the dot executable. Keeps the subprocess path as a fallback.
+    """
+    try:
+        # pyrefly: ignore [missing-import]
+        import pygraphviz
+    except ImportError:
+        return
+    # pyrefly: ignore [missing-import]
+    from diagrams import Diagram
+
+    subprocess_render = Diagram.render
+
+    def render(self):
+        try:
+            formats = self.outformat if isinstance(self.outformat, list) else [self.outformat]
+            graph = pygraphviz.AGraph(string=self.dot.source)
+            for fmt in formats:
+                graph.draw(f"{self.filename}.{fmt}", format=fmt, prog="dot")
+            # Diagram.__exit__ deletes the dot source file, so it must exist
+            with open(self.filename, "w", encoding="utf-8") as f:
+                f.write(self.dot.source)
+        except Exception:
+            subprocess_render(self)
+
+    Diagram.render = render
+
+
+def _worker_loop(conn):
+    """
+    Runs in a separate process so generated code never touches the Streamlit process.
+    Keeps the diagrams package imported between renders.
+    """
+    # pyrefly: ignore [missing-import]
+    import diagrams  # noqa: F401 - pre-warm the import
+    _install_pygraphviz_renderer()
+
+    while True:
+        code_str = conn.recv()
+        if code_str is None:
+            break
+
+        cwd = os.getcwd()
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                os.chdir(tmp_dir)
+                try:
+                    exec(code_str, {"__name__": "__diagram__", "__builtins__": __builtins__})
+                    image_path = os.path.join(tmp_dir, "generated_diagram.png")
+                    if os.path.exists(image_path):
+                        with open(image_path, "rb") as f:
+                            conn.send(("ok", f.read()))
+                    else:
+                        conn.send(("error", "Diagram image was not generated. Check the code logic."))
+                finally:
+                    os.chdir(cwd)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def start_worker():
+    """Starts the render worker if it is not already running."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker[0].is_alive():
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+            process.start()
+            _worker = (process, parent_conn)
+        return _worker
+
+
+def _stop_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker[0].terminate()
+            _worker = None
+
+
+def _render(code_str):
+    """Sends code to the worker and returns the PNG bytes."""
+    with _worker_lock:
+        _, conn = start_worker()
+        try:
+            conn.send(code_str)
+            if not conn.poll(RENDER_TIMEOUT):
+                _stop_worker()
+                raise TimeoutError(f"Rendering took longer than {RENDER_TIMEOUT}s")
+            status, payload = conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            _stop_worker()
+            raise RuntimeError("Render worker exited unexpectedly")
+
+    if status != "ok":
+        raise RuntimeError(payload)
+    return payload
+
+
+class _RenameAssigned(ast.NodeTransformer):
+    """Renames assigned variables to v0, v1, ... in order of first assignment."""
+
+    def __init__(self, assigned):
+        self.mapping = {name: f"v{i}" for i, name in enumerate(assigned)}
+
+    def visit_Name(self, node):
+        if node.id in self.mapping:
+            node.id = self.mapping[node.id]
+        return node
+
+
+def canonicalize_code(code_str):
+    """
+    Normalizes code so equivalent scripts share a cache key: formatting and
+    comments are dropped, imports sorted, and variable names replaced.
+    Variable names never reach the rendered image, only node labels do.
+    """
+    tree = ast.parse(code_str)
+    assigned = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id not in assigned:
+                    assigned.append(target.id)
+    canon = ast.unparse(_RenameAssigned(assigned).visit(tree))
+    if isort is not None:
+        canon = isort.code(canon)
+    return canon
+
+
+def _cache_key(code_str):
+    try:
+        canon = canonicalize_code(code_str)
+    except (SyntaxError, ValueError):
+        canon = code_str
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
 
 def execute_diagram_code(code_str):
     """
     Executes the provided Python code string to generate a diagram.
     Returns the path to the generated image or raises an error.
+    Rendered images are cached by a hash of the canonicalized code, so equivalent code is only drawn once.
     """
+    key = _cache_key(code_str)
+    png_path = os.path.join(CACHE_DIR, f"{key}.png")
+    if os.path.exists(png_path):
+        return png_path
+
     try:
-        # Execute the code
-        # The code is expected to generate 'generated_diagram.png'
-        exec(code_str, globals())
-        
-        # Check if file exists
-        if os.path.exists("generated_diagram.png"):
-            return "generated_diagram.png"
-        else:
-            raise FileNotFoundError("Diagram image was not generated. Check the code logic.")
-            
+        png_bytes = _render(code_str)
     except Exception as e:
         # Log the failing code for debugging
-        numbered_code = "\n".join([f"{i+1}: {line}" for i, line in enumerate(code_str.splitlines())])
+        numbered_code = "\n".join(f"{i}: {line}" for i, line in enumerate(code_str.splitlines(), 1))
         print(f"FAILED CODE:\n{'-'*20}\n{numbered_code}\n{'-'*20}")
-        raise RuntimeError(f"Failed to execute diagram code: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Failed to execute diagram code: {e}")
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(png_path, "wb") as f:
+        f.write(png_bytes)
+    return png_path
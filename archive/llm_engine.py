@@ -1,125 +1,120 @@
+import io
 import os
+import re
+import ast
+import tokenize
+import json
+import asyncio
+import bisect
+import hashlib
+import shelve
+import functools
 # pyrefly: ignore [missing-import]
-from openai import OpenAI
+import httpx
+# pyrefly: ignore [missing-import]
+from openai import OpenAI, AsyncOpenAI
 
-class LLMEngine:
-    def __init__(self):
-        self.api_key = os.getenv("NVIDIA_API_KEY")
-        if not self.api_key:
-            raise ValueError("NVIDIA_API_KEY not found in environment variables")
-            
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=self.api_key
-        )
-        # Using Standard Llama 3.1 70B
-        self.model = "meta/llama-3.1-70b-instruct"
+CACHE_DIR = ".arcgen_cache"
 
-    def generate_code(self, user_prompt):
-        """
-        Generates Python code using the diagrams library based on the user prompt.
-        """
-        system_prompt = """Core Rules
-Library Constraint
-Use only the diagrams library (https://diagrams.mingrammer.com/).
-Do not use any other libraries or modules.
-Output Format
-Return valid Python code enclosed in markdown backticks.
-Example:
-```python
-... code ...
-```
-Do not include explanations or comments outside the code block.
-The response must be a single, runnable Python script.
-Basic Structure
-Always define:
-from diagrams import Diagram, Cluster
+NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=10, max_connections=20)
 
-graph_attr = {"rankdir": "LR", "splines": "ortho"}
+# Generation parameters
+TEMPERATURE = 0.1
+MAX_TOKENS = 512
+
+VARIANT_SEPARATOR = "---VARIANT---"
 
+# Cosine similarity above which a paraphrased prompt reuses cached code
+SEMANTIC_THRESHOLD = 0.92
+
+# Code extraction
+_CODE_BLOCK_RE = re.compile(r'```python\s*(.*?)```', re.DOTALL)
+_BARE_FENCE_RE = re.compile(r'```\s*(.*?)```', re.DOTALL)
+_IMPORT_RE = re.compile(r'(from diagrams|import diagrams)')
+
+# Common import errors the LLM makes despite prompt instructions
+REPLACEMENTS = [
+    ("from diagrams.onprem.database import SQL", "from diagrams.generic.database import SQL"),
+    ("from diagrams.generic.network import Client", "from diagrams.onprem.client import Client"),
+    ("from diagrams.generic.network import User", "from diagrams.onprem.client import User"),
+    ("from diagrams.generic.compute import Server", "from diagrams.onprem.compute import Server"),
+    ("from diagrams.aws.database import PostgreSQL", "from diagrams.aws.database import RDS"),
+    ("from diagrams.generic.network import Nginx", "from diagrams.onprem.network import Nginx"),
+    ("from diagrams.generic.network import CDN", "from diagrams.aws.network import CloudFront as CDN"),
+    ("from diagrams.generic.programming import React", "from diagrams.programming.framework import React"),
+    ("from diagrams.generic.programming", "from diagrams.programming.language"),
+    ("from diagrams.onprem.storage import HDFS", "from diagrams.onprem.analytics import Hadoop as HDFS"),
+    ("from diagrams.generic.place import Region", "from diagrams.generic.place import Datacenter as Region"),
+]
+_FIX_MAP = dict(REPLACEMENTS)
+# Longest-first so a longer bad import wins over its own prefix
+_FIX_RE = re.compile('|'.join(re.escape(k) for k in sorted(_FIX_MAP, key=len, reverse=True)))
+
+# Aho-Corasick automaton over the same table, when pyahocorasick is installed
+try:
+    # pyrefly: ignore [missing-import]
+    import ahocorasick
+
+    _FIX_AC = ahocorasick.Automaton()
+    for _bad, _good in REPLACEMENTS:
+        _FIX_AC.add_word(_bad, (_bad, _good))
+    _FIX_AC.make_automaton()
+except ImportError:
+    _FIX_AC = None
+
+
+def _apply_import_fixes(code):
+    """Rewrites every bad import in REPLACEMENTS in a single scan of code."""
+    if _FIX_AC is None:
+        return _FIX_RE.sub(lambda m: _FIX_MAP[m.group(0)], code)
+
+    parts = []
+    pos = 0
+    # iter_long yields non-overlapping, longest matches left to right
+    for end, (bad, good) in _FIX_AC.iter_long(code):
+        start = end - len(bad) + 1
+        parts.append(code[pos:start])
+        parts.append(good)
+        pos = end + 1
+    parts.append(code[pos:])
+    return ''.join(parts)
+
+# Post-processing
+_TRAIL_OP_RE = re.compile(r'\s*(>>|<<)\s*$', re.MULTILINE)
+
+# Kept compact and byte-identical across calls so provider prefix caching can reuse it
+SYSTEM_PROMPT = """You write Python using ONLY the diagrams library (https://diagrams.mingrammer.com/).
+Reply with a single runnable script in one ```python block. No text outside the block.
+
+Required skeleton:
+from diagrams import Diagram, Cluster
+graph_attr = {"rankdir": "LR", "splines": "ortho"}
 with Diagram("Architecture", show=False, filename="generated_diagram", graph_attr=graph_attr):
     ...
-show=False is mandatory.
-filename="generated_diagram" is mandatory.
-Imports and Providers
-Import only what you actually use.
-Common providers and modules:
-AWS: diagrams.aws.compute, diagrams.aws.database, diagrams.aws.network, etc.
-Azure: diagrams.azure.compute, diagrams.azure.database, etc.
-GCP: diagrams.gcp.compute, diagrams.gcp.database, etc.
-On-prem:
-diagrams.onprem.compute (e.g., Server, Nomad)
-diagrams.onprem.database
-diagrams.onprem.network (e.g., Nginx, Apache, HAProxy)
-diagrams.onprem.monitoring (e.g., Prometheus, Grafana)
-diagrams.onprem.client (e.g., User, Client)
-Generic:
-diagrams.generic.compute (only Rack)
-diagrams.generic.database (SQL is HERE. Use: from diagrams.generic.database import SQL)
-diagrams.generic.network
-diagrams.generic.storage
-diagrams.generic.os
-diagrams.generic.place
-diagrams.generic.device
-Programming:
-diagrams.programming.language (e.g., Python, NodeJS, Go)
-diagrams.programming.framework (e.g., Django, React, Spring)
-Negative Constraints (CRITICAL)
-When using the diagrams library:
-Do NOT import SQL from diagrams.onprem.database (it does not exist).
-Use from diagrams.generic.database import SQL.
-Do NOT import from diagrams.generic.programming.
-Use diagrams.programming.language or diagrams.programming.framework.
-Do NOT import from diagrams.generic.monitoring.
-Use diagrams.onprem.monitoring instead.
-Do NOT import from diagrams.generic.software.
-Use diagrams.programming.language or diagrams.programming.framework.
-Do NOT import Nginx from diagrams.generic.network.
-Use from diagrams.onprem.network import Nginx.
-Do NOT import Database from diagrams.generic.database (it does not exist).
-Use from diagrams.generic.database import SQL.
-Do NOT import Server from diagrams.generic.compute (it does not exist).
-Use from diagrams.onprem.compute import Server.
-Do NOT import Server from diagrams.generic.compute (it does not exist).
-Use from diagrams.onprem.compute import Server.
-Do NOT import Client or User from diagrams.generic.network (they do not exist).
-Use from diagrams.onprem.client import Client or User.
-Do NOT import SQL from diagrams.onprem.database (it does not exist).
-Use from diagrams.generic.database import SQL.
-AWS naming (case-sensitive):
-Use Dynamodb (NOT DynamoDB).
-Use Elasticache (NOT ElastiCache).
-DocumentDB is correct.
-Redshift is correct.
-Graph Layout and Grouping
-Always define graph_attr = {"rankdir": "LR", "splines": "ortho"}.
-Use Cluster to group related components, for example:
-"VPC", "Services", "Data Layer", "Messaging", "Monitoring", "CDN Layer", etc.
-Prefer a professional, readable structure:
-Group databases into a "Data Layer" cluster.
-Group microservices into a "Services" or "Microservices" cluster.
-Group external users/clients at the left, downstream systems toward the right.
-Connections
-Use >> to represent data flow or request flow between nodes.
-You may chain connections:
-user >> api >> service >> db
-Ensure all referenced nodes are defined before using them.
-Verify variable names match exactly (e.g., if you define `auth_service = ...`, do not use `auth >> ...`).
-Do NOT truncate variable names. Use full names or simple, consistent abbreviations.
-Inference Rules
-If the user does not specify a cloud provider, default to:
-AWS for cloud resources (EC2, RDS, ALB, etc.), and
-Generic or OnPrem for abstract or non-cloud-specific components.
-Infer reasonable groupings (clusters) based on the description even if not explicitly asked:
-Example: request handling layer, business logic layer, data layer, caching layer, monitoring/observability.
-Map vague terms to reasonable diagrams components:
-“Web server” → EC2 (or Nginx in on-prem)
-“Database” → RDS (AWS) or SQL (generic)
-“Cache” → Elasticache (AWS) or a suitable cache node in another provider.
-Example Behavior
-For the input:
-"Web server connected to database in a VPC"
-A valid response should look like:
+
+Modules (import only what you use):
+aws/azure/gcp: diagrams.<provider>.compute|database|network|...
+onprem: compute (Server, Nomad), database, network (Nginx, Apache, HAProxy), monitoring (Prometheus, Grafana), client (User, Client)
+generic: compute (Rack only), database (SQL), network, storage, os, place, device
+programming: language (Python, NodeJS, Go), framework (Django, React, Spring)
+
+Wrong -> right:
+SQL: diagrams.generic.database (not onprem.database; there is no Database class)
+Server: diagrams.onprem.compute (not generic.compute)
+Client, User: diagrams.onprem.client (not generic.network)
+Nginx: diagrams.onprem.network (not generic.network)
+monitoring: diagrams.onprem.monitoring (no generic.monitoring)
+languages/frameworks: diagrams.programming.* (no generic.programming or generic.software)
+AWS names: Dynamodb, Elasticache, DocumentDB, Redshift
+
+Rules:
+- Group with Cluster ("VPC", "Services", "Data Layer", "Monitoring", ...); users on the left, data stores on the right.
+- Connect with >> (chains allowed). Define every node before use and reuse its exact variable name.
+- No cloud given: AWS for cloud resources, generic/onprem otherwise. Web server -> EC2, database -> RDS, cache -> Elasticache.
+
+Example, "Web server connected to database in a VPC":
+```python
 from diagrams import Diagram, Cluster
 from diagrams.aws.compute import EC2
 from diagrams.aws.database import RDS
@@ -129,94 +124,311 @@ with Diagram("Architecture", show=False, filename="generated_diagram", graph_att
         web = EC2("Web Server")
         db = RDS("Database")
         web >> db
+```"""
 
-Example 2 (Generic SQL):
-Input: "Python app with SQL database"
-Output:
-from diagrams import Diagram
-from diagrams.programming.language import Python
-from diagrams.generic.database import SQL
 
-graph_attr = {"rankdir": "LR", "splines": "ortho"}
+@functools.cache
+def _get_embedder():
+    # pyrefly: ignore [missing-import]
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
 
-with Diagram("Architecture", show=False, filename="generated_diagram", graph_attr=graph_attr):
-    app = Python("App")
-    db = SQL("Database")
-    app >> db
 
-CRITICAL FINAL REMINDERS:
-- Use `from diagrams.generic.database import SQL` (NOT onprem).
-- Use `from diagrams.onprem.client import Client` (NOT generic).
-- Use `Dynamodb` (lowercase 'db').
-- Follow these rules strictly. Do not add any text outside the Python code."""
+class SemanticCache:
+    """
+    Nearest-neighbour cache over prompt embeddings, so paraphrases of an
+    earlier description reuse its generated code.
+    Disables itself if sentence-transformers or faiss are not installed.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, threshold=SEMANTIC_THRESHOLD):
+        self.index_path = os.path.join(cache_dir, "semantic.faiss")
+        self.entries_path = os.path.join(cache_dir, "semantic.json")
+        self.threshold = threshold
+        self.enabled = True
+        self.index = None
+        self.entries = []  # (prompt, code), parallel to the index rows
+        self._last = (None, None)  # (prompt, vec) so lookup + add embed only once
+
+    def _load(self):
+        if self.index is not None:
+            return
+        # pyrefly: ignore [missing-import]
+        import faiss
+
+        if os.path.exists(self.index_path) and os.path.exists(self.entries_path):
+            self.index = faiss.read_index(self.index_path)
+            with open(self.entries_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        else:
+            dim = _get_embedder().get_sentence_embedding_dimension()
+            self.index = faiss.IndexFlatIP(dim)
+            self.entries = []
+
+    def embed(self, prompt):
+        """Return the L2-normalized embedding for prompt, or None if disabled."""
+        if not self.enabled:
+            return None
+        if self._last[0] == prompt:
+            return self._last[1]
+        try:
+            self._load()
+            vec = _get_embedder().encode([prompt], normalize_embeddings=True).astype("float32")
+            self._last = (prompt, vec)
+            return vec
+        except Exception as e:
+            print(f"Semantic cache disabled: {e}")
+            self.enabled = False
+            return None
+
+    def lookup(self, vec):
+        if vec is None or not self.entries:
+            return None
+        scores, ids = self.index.search(vec, 1)
+        if ids[0][0] >= 0 and scores[0][0] >= self.threshold:
+            return self.entries[ids[0][0]][1]
+        return None
+
+    def add(self, vec, prompt, code):
+        if vec is None:
+            return
+        # pyrefly: ignore [missing-import]
+        import faiss
+
+        self.index.add(vec)
+        self.entries.append((prompt, code))
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            faiss.write_index(self.index, self.index_path)
+            with open(self.entries_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+        except Exception as e:
+            print(f"Semantic cache write failed: {e}")
+
+
+class LLMEngine:
+    def __init__(self):
+        self.api_key = os.getenv("NVIDIA_API_KEY")
+        if not self.api_key:
+            raise ValueError("NVIDIA_API_KEY not found in environment variables")
+            
+        # Keep-alive pool so repeated requests reuse the TCP/TLS connection
+        self.client = OpenAI(
+            base_url=NVIDIA_BASE_URL,
+            api_key=self.api_key,
+            http_client=httpx.Client(limits=HTTP_LIMITS)
+        )
+        # Using Standard Llama 3.1 70B
+        self.model = "meta/llama-3.1-70b-instruct"
+        self.semantic_cache = SemanticCache()
+
+    def generate_code(self, user_prompt):
+        """
+        Generates Python code using the diagrams library based on the user prompt.
+        Results are cached on disk by prompt hash, so repeated descriptions skip the API call,
+        and by prompt embedding, so close paraphrases do too.
+        """
+        cached = self.get_cached_code(user_prompt)
+        if cached is not None:
+            return cached
 
         try:
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.2,
+                temperature=TEMPERATURE,
                 top_p=1,
-                max_tokens=1024,
+                max_tokens=MAX_TOKENS,
                 stream=False
             )
-            
-            code = completion.choices[0].message.content
-            
-            # Robust code extraction using regex
-            import re
-            
-            # 1. Look for ```python ... ```
-            match = re.search(r'```python\s*(.*?)```', code, re.DOTALL)
-            if match:
-                code = match.group(1).strip()
-            else:
-                # 2. Look for ``` ... ```
-                match = re.search(r'```\s*(.*?)```', code, re.DOTALL)
-                if match:
-                    code = match.group(1).strip()
-                # 3. Fallback: Look for the first occurrence of "from diagrams" or "import diagrams"
-                # This handles cases like "Here is the code:\nfrom diagrams import..."
-                import_match = re.search(r'(from diagrams|import diagrams)', code)
-                if import_match:
-                    start_index = import_match.start()
-                    code = code[start_index:].strip()
-            
-            # 4. Post-process code to fix common LLM hallucinations
-            code = self._post_process_code(code)
-            
-            return code
+
+            return self.finalize_code(user_prompt, completion.choices[0].message.content)
 
         except Exception as e:
             print(f"Error generating code: {e}")
             return None
 
+    def generate_variants(self, user_prompt, n=3):
+        """
+        Generates n alternative designs in a single request, so the system prompt
+        is processed once instead of n times. Returns a list of code strings.
+        """
+        variant_prompt = (
+            f"{user_prompt}\n\nProduce {n} distinct solutions, each wrapped in its own "
+            f"```python fenced block, separated by '{VARIANT_SEPARATOR}'."
+        )
+        try:
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": variant_prompt}
+                ],
+                temperature=TEMPERATURE,
+                top_p=1,
+                max_tokens=MAX_TOKENS * n,
+                stream=False
+            )
+        except Exception as e:
+            print(f"Error generating variants: {e}")
+            return []
+
+        content = completion.choices[0].message.content
+        blocks = _CODE_BLOCK_RE.findall(content) or content.split(VARIANT_SEPARATOR)
+        variants = [self._post_process_code(self._extract_code(block.strip())) for block in blocks]
+        return [code for code in variants if code][:n]
+
+    async def batch_generate_code(self, prompts):
+        """
+        Generates code for several descriptions concurrently.
+        Returns a list aligned with prompts; failed entries are None.
+        """
+        async def _one(aclient, user_prompt):
+            cached = self.get_cached_code(user_prompt)
+            if cached is not None:
+                return cached
+            try:
+                completion = await aclient.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=TEMPERATURE,
+                    top_p=1,
+                    max_tokens=MAX_TOKENS,
+                    stream=False
+                )
+                return self.finalize_code(user_prompt, completion.choices[0].message.content)
+            except Exception as e:
+                print(f"Error generating code: {e}")
+                return None
+
+        # An async client is bound to the running event loop, so open one per batch
+        async with AsyncOpenAI(
+            base_url=NVIDIA_BASE_URL,
+            api_key=self.api_key,
+            http_client=httpx.AsyncClient(limits=HTTP_LIMITS)
+        ) as aclient:
+            return await asyncio.gather(*[_one(aclient, p) for p in prompts])
+
+    def stream_code(self, user_prompt):
+        """
+        Yields raw LLM output chunks as they arrive.
+        Pass the concatenated text to finalize_code to get runnable code.
+        """
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=TEMPERATURE,
+            top_p=1,
+            max_tokens=MAX_TOKENS,
+            stream=True
+        )
+        for chunk in completion:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    def get_cached_code(self, user_prompt):
+        """Returns previously generated code for this (or a paraphrased) prompt, or None."""
+        cached = self._cache_get(self._cache_key(user_prompt))
+        if cached is not None:
+            return cached
+        return self.semantic_cache.lookup(self.semantic_cache.embed(user_prompt))
+
+    def finalize_code(self, user_prompt, raw):
+        """Extracts and repairs code from a full LLM response, then caches it."""
+        code = self._extract_code(raw)
+
+        # Post-process code to fix common LLM hallucinations
+        code = self._post_process_code(code)
+
+        if code:
+            self._cache_set(self._cache_key(user_prompt), code)
+            self.semantic_cache.add(self.semantic_cache.embed(user_prompt), user_prompt, code)
+
+        return code
+
+    def _extract_code(self, code):
+        """Robust code extraction using regex"""
+        # 1. Look for ```python ... ``` (plain substring search; this is the common case)
+        start = code.find("```python")
+        if start >= 0:
+            end = code.find("```", start + 9)
+            if end >= 0:
+                return code[start + 9:end].strip()
+
+        # 2. Look for ``` ... ```
+        match = _BARE_FENCE_RE.search(code)
+        if match:
+            code = match.group(1).strip()
+        # 3. Fallback: Look for the first occurrence of "from diagrams" or "import diagrams"
+        # This handles cases like "Here is the code:\nfrom diagrams import..."
+        import_match = _IMPORT_RE.search(code)
+        if import_match:
+            start_index = import_match.start()
+            code = code[start_index:].strip()
+        return code
+
+    def _cache_key(self, user_prompt):
+        """SHA-256 of (model, system prompt, user prompt)."""
+        raw = f"{self.model}|{SYSTEM_PROMPT}|{user_prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _open_cache(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        return shelve.open(os.path.join(CACHE_DIR, "responses"))
+
+    def _cache_get(self, key):
+        try:
+            with self._open_cache() as cache:
+                return cache.get(key)
+        except Exception as e:
+            print(f"Cache read failed: {e}")
+            return None
+
+    def _cache_set(self, key, code):
+        try:
+            with self._open_cache() as cache:
+                cache[key] = code
+        except Exception as e:
+            print(f"Cache write failed: {e}")
+
+    @staticmethod
+    def _resolve(undefined, defined_vars, sorted_defined):
+        """
+        Finds the defined variable a truncated name most likely refers to.
+        sorted_defined is defined_vars in sorted order, used as a prefix index.
+        """
+        # Find defined vars that start with the undefined var (e.g. 'licensing' matches 'licensing_drm_service').
+        # Names sharing a prefix are contiguous in sorted order; prefer the shortest.
+        start = bisect.bisect_left(sorted_defined, undefined)
+        end = start
+        while end < len(sorted_defined) and sorted_defined[end].startswith(undefined):
+            end += 1
+        if end > start:
+            return min(sorted_defined[start:end], key=len)
+
+        # If not found, try the other way around (undefined starts with defined - less likely for truncation but possible)
+        for i in range(len(undefined) - 1, 0, -1):
+            if undefined[:i] in defined_vars:
+                return undefined[:i]
+        return None
+
     def _post_process_code(self, code):
         """
         Fixes common import errors that the LLM tends to make despite prompt instructions.
         """
-        replacements = [
-            ("from diagrams.onprem.database import SQL", "from diagrams.generic.database import SQL"),
-            ("from diagrams.generic.network import Client", "from diagrams.onprem.client import Client"),
-            ("from diagrams.generic.network import User", "from diagrams.onprem.client import User"),
-            ("from diagrams.generic.compute import Server", "from diagrams.onprem.compute import Server"),
-            ("from diagrams.aws.database import PostgreSQL", "from diagrams.aws.database import RDS"),
-            ("from diagrams.generic.network import Nginx", "from diagrams.onprem.network import Nginx"),
-            ("from diagrams.generic.network import CDN", "from diagrams.aws.network import CloudFront as CDN"),
-            ("from diagrams.generic.programming import React", "from diagrams.programming.framework import React"),
-            ("from diagrams.generic.programming", "from diagrams.programming.language"),
-            ("from diagrams.onprem.storage import HDFS", "from diagrams.onprem.analytics import Hadoop as HDFS"),
-            ("from diagrams.generic.place import Region", "from diagrams.generic.place import Datacenter as Region"),
-        ]
-        
-        for bad, good in replacements:
-            code = code.replace(bad, good)
-            
+        code = _apply_import_fixes(code)
+
         # Remove trailing connection operators (e.g., "a >> b >>")
-        import re
-        code = re.sub(r'\s*(>>|<<)\s*$', '', code, flags=re.MULTILINE)
+        code = _TRAIL_OP_RE.sub('', code)
 
         # Fix unterminated string/parentheses at the very end of code (truncation)
         stripped_code = code.strip()
@@ -234,31 +446,112 @@ CRITICAL FINAL REMINDERS:
              code += '"Unknown")'
 
         # Fix truncated variable names
-        # 1. Extract all defined variables (lhs = ...)
-        defined_vars = set(re.findall(r'^\s*(\w+)\s*=', code, re.MULTILINE))
-        
-        # 2. Find all used variables in connections (>> var or var >>)
-        used_vars = set(re.findall(r'(\w+)\s*(?:>>|<<)', code)) | \
-                    set(re.findall(r'(?:>>|<<)\s*(\w+)', code)) | \
-                    set(re.findall(r'^\s*(\w+)\s*$', code, re.MULTILINE))
+        # Prefer a single AST walk; fall back to regex heuristics if the code still doesn't parse
+        repaired = self._repair_names_ast(code)
+        if repaired is not None:
+            return repaired
+        return self._repair_names_regex(code)
+
+    def _match_undefined(self, undefined_vars, defined_vars):
+        """Maps each undefined name to the defined name it was most likely truncated from."""
+        sorted_defined = sorted(defined_vars)
+        return {u: match for u in undefined_vars if (match := self._resolve(u, defined_vars, sorted_defined))}
+
+    def _repair_names_ast(self, code):
+        """
+        Renames undefined connection operands using the parsed tree.
+        Only real Name nodes are rewritten, never text inside labels.
+        Returns None if the code is not valid Python.
+        """
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+
+        # 1. Defined variables (assignment targets) and 2. names used in >> / << connections or alone on a line
+        defined_vars, used_vars = set(), set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                defined_vars.update(t.id for t in node.targets if isinstance(t, ast.Name))
+            elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.RShift, ast.LShift)):
+                for side in (node.left, node.right):
+                    items = side.elts if isinstance(side, (ast.List, ast.Tuple)) else [side]
+                    used_vars.update(item.id for item in items if isinstance(item, ast.Name))
+            elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Name):
+                used_vars.add(node.value.id)
+
+        # 3./4. Match undefined vars to defined vars
+        fixes = self._match_undefined(used_vars - defined_vars, defined_vars)
+        if not fixes:
+            return code
+
+        # col_offset is in UTF-8 bytes; apply edits right-to-left so offsets stay valid
+        lines = [line.encode("utf-8") for line in code.splitlines(keepends=True)]
+        edits = sorted(
+            ((n.lineno - 1, n.col_offset, n.end_col_offset, fixes[n.id])
+             for n in ast.walk(tree) if isinstance(n, ast.Name) and n.id in fixes),
+            reverse=True,
+        )
+        for row, start, end, name in edits:
+            lines[row] = lines[row][:start] + name.encode("utf-8") + lines[row][end:]
+        return b"".join(lines).decode("utf-8")
+
+    @staticmethod
+    def _scan_names(code):
+        """
+        One tokenize pass over code that may not parse.
+        Returns (defined, used): names assigned at the start of a line, and names
+        next to >> / << or alone on a line.
+        """
+        # Indentation is irrelevant here, and dropping it means a bad dedent can't stop the scan
+        source = "\n".join(line.lstrip() for line in code.splitlines())
+        tokens = []
+        try:
+            for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+                if tok.type != tokenize.COMMENT:
+                    tokens.append(tok)
+        except (tokenize.TokenError, SyntaxError):
+            # Truncated code: keep the tokens read before the error
+            pass
+
+        defined_vars, used_vars = set(), set()
+        for i, tok in enumerate(tokens):
+            if tok.type != tokenize.NAME:
+                continue
+            prev = tokens[i - 1] if i else None
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            starts_line = prev is None or prev.end[0] < tok.start[0]
+            ends_line = nxt is None or nxt.start[0] > tok.end[0] or nxt.type in (tokenize.NEWLINE, tokenize.NL)
+
+            if starts_line and nxt is not None and nxt.string == "=":
+                defined_vars.add(tok.string)
+            elif (nxt is not None and nxt.string in (">>", "<<")) or \
+                    (prev is not None and prev.string in (">>", "<<")) or \
+                    (starts_line and ends_line):
+                used_vars.add(tok.string)
+        return defined_vars, used_vars
+
+    def _repair_names_regex(self, code):
+        """Token-scan fallback for code the AST parser rejects."""
+        # 1. Defined variables (lhs = ...) and 2. used variables in connections (>> var or var >>)
+        defined_vars, used_vars = self._scan_names(code)
         
         # 3. Identify undefined variables
         undefined_vars = used_vars - defined_vars
         
         # 4. Attempt to match undefined vars to defined vars (prefix match)
-        for undefined in undefined_vars:
-            # Find a defined var that starts with the undefined var (e.g. 'licensing' matches 'licensing_drm_service')
-            # We prefer the shortest defined var that matches, or just the first one found.
-            match = next((v for v in defined_vars if v.startswith(undefined)), None)
-            
-            # If not found, try the other way around (undefined starts with defined - less likely for truncation but possible)
-            if not match:
-                match = next((v for v in defined_vars if undefined.startswith(v)), None)
-                
-            if match:
-                # Replace the undefined var with the match in the code
-                # Use word boundary to avoid partial replacements of other words
-                code = re.sub(r'\b' + re.escape(undefined) + r'\b', match, code)
+        fixes = self._match_undefined(undefined_vars, defined_vars)
+
+        if fixes:
+            # Replace all undefined vars in one pass
+            # Use word boundary to avoid partial replacements of other words
+            fix_re = re.compile(r'\b(' + '|'.join(map(re.escape, fixes)) + r')\b')
+            code = fix_re.sub(lambda m: fixes[m.group(1)], code)
             
         return code
 
+
+@functools.lru_cache(maxsize=1)
+def get_engine():
+    """Returns a process-wide LLMEngine so its HTTP connections are reused."""
+    return LLMEngine()
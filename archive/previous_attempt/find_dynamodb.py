@@ -1,26 +1,53 @@
+import os
+import json
 import importlib
 import pkgutil
-# pyrefly: ignore [missing-import]
-import diagrams.aws
-
-def find_node(node_name, package):
-    """Recursively search for a node in a package."""
-    results = []
-    if hasattr(package, "__path__"):
-        for _, name, is_pkg in pkgutil.walk_packages(package.__path__, package.__name__ + "."):
-            try:
-                module = importlib.import_module(name)
-                if hasattr(module, node_name):
-                    results.append(name)
-            except ImportError:
-                continue
-    return results
-
-print(f"Searching for DynamoDB in diagrams.aws...")
-locations = find_node("DynamoDB", diagrams.aws)
-print(f"Found DynamoDB in: {locations}")
-
-# Also check for case variations just in case
-print(f"Searching for Dynamodb in diagrams.aws...")
-locations_lower = find_node("Dynamodb", diagrams.aws)
-print(f"Found Dynamodb in: {locations_lower}")
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diagrams_index.json")
+
+
+def build_index(package_name="diagrams"):
+    """One-time walk of the package: maps every public name to the modules defining it."""
+    # pyrefly: ignore [missing-import]
+    package = importlib.import_module(package_name)
+    index = {}
+    for _, name, is_pkg in pkgutil.walk_packages(package.__path__, package.__name__ + "."):
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        for attr in dir(module):
+            if not attr.startswith("_"):
+                index.setdefault(attr, []).append(name)
+    return index
+
+
+def load_index():
+    """Loads the name -> modules index, building it on first use."""
+    if os.path.exists(INDEX_PATH):
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    index = build_index()
+    with open(INDEX_PATH, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+
+INDEX = load_index()
+
+
+def find_node(node_name, package_name="diagrams.aws"):
+    """Look up the modules under package_name that export node_name."""
+    prefix = package_name + "."
+    return [name for name in INDEX.get(node_name, []) if name.startswith(prefix)]
+
+
+if __name__ == "__main__":
+    print(f"Searching for DynamoDB in diagrams.aws...")
+    locations = find_node("DynamoDB")
+    print(f"Found DynamoDB in: {locations}")
+
+    # Also check for case variations just in case
+    print(f"Searching for Dynamodb in diagrams.aws...")
+    locations_lower = find_node("Dynamodb")
+    print(f"Found Dynamodb in: {locations_lower}")
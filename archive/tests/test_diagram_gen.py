@@ -0,0 +1,54 @@
+"""
+Tests for the archived Streamlit render worker
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import diagram_gen  # noqa: E402
+
+
+def _echo_worker(conn):
+    """Stands in for the diagrams worker: replies with the code it was sent"""
+    while True:
+        code_str = conn.recv()
+        if code_str is None:
+            break
+        time.sleep(0.05)
+        conn.send(("ok", code_str.encode("utf-8")))
+
+
+@pytest.fixture
+def echo_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(diagram_gen, "_worker_loop", _echo_worker)
+    monkeypatch.setattr(diagram_gen, "CACHE_DIR", str(tmp_path))
+    diagram_gen._stop_worker()
+    yield
+    diagram_gen._stop_worker()
+
+
+def test_concurrent_renders_get_their_own_image(echo_worker):
+    """Two sessions rendering at once must not receive each other's PNG"""
+    codes = ["a = 1\nprint(a)", "b = 2\nprint(b, b)"]
+    paths = {}
+
+    def render(code):
+        for i in range(5):
+            paths.setdefault(code, []).append(diagram_gen.execute_diagram_code(f"{code}\nc = {i}"))
+
+    threads = [threading.Thread(target=render, args=(code,)) for code in codes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for code in codes:
+        for path in paths[code]:
+            with open(path, "rb") as f:
+                assert f.read().decode("utf-8").startswith(code)
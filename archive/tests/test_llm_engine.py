@@ -0,0 +1,92 @@
+"""
+Tests for repairing truncated variable names in generated diagram code
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_engine import LLMEngine  # noqa: E402
+
+
+@pytest.fixture
+def engine():
+    # The repair helpers need no API client
+    return LLMEngine.__new__(LLMEngine)
+
+
+_HEADER = '''from diagrams import Diagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+
+with Diagram("Licensing", show=False, filename="generated_diagram"):
+'''
+
+
+def _code(*lines):
+    return _HEADER + "".join(f"    {line}\n" for line in lines)
+
+
+class TestRepairNamesAst:
+    """Test the AST-based name repair"""
+
+    def test_truncated_name_is_completed(self, engine):
+        """A connection operand cut short is renamed, but matching label text is not"""
+        code = _code('licensing_drm_service = EC2("licensing")', 'db = RDS("DB")', "licensing >> db")
+
+        assert engine._repair_names_ast(code) == _code(
+            'licensing_drm_service = EC2("licensing")', 'db = RDS("DB")', "licensing_drm_service >> db"
+        )
+
+    def test_offsets_after_non_ascii_labels(self, engine):
+        """Renames land in the right place when earlier text on the line is multi-byte"""
+        code = _code('licensing_drm_service = EC2("x")', 'db = RDS("DB")', 'db >> [EC2("Zürich"), licensing]')
+
+        assert engine._repair_names_ast(code).endswith('    db >> [EC2("Zürich"), licensing_drm_service]\n')
+
+    @pytest.mark.parametrize("lines", [
+        ('web = EC2("Web")', 'web_server = EC2("Web server")', 'db = RDS("DB")', "web >> db"),
+        ('db = RDS("DB")', "cache >> db"),
+        ('api = EC2("API")', 'db = RDS("DB")', "api >> db", "db"),
+    ], ids=["defined-prefix", "no-match", "all-defined"])
+    def test_names_left_alone(self, engine, lines):
+        """Defined names, and undefined names with nothing to match, are not rewritten"""
+        code = _code(*lines)
+        assert engine._repair_names_ast(code) == code
+
+    def test_unparsable_code_falls_back(self, engine):
+        """Code the parser rejects returns None, and post-processing repairs it with the token scan"""
+        code = _code('licensing_drm_service = EC2("Licensing")', 'db = RDS("DB"', "licensing >> db")
+
+        assert engine._repair_names_ast(code) is None
+        assert engine._post_process_code(code).endswith("    licensing_drm_service >> db\n")
+
+
+class TestScanNames:
+    """Test the tokenize-based name scan used for code that doesn't parse"""
+
+    def test_defined_and_used(self, engine):
+        """Names around >> / << and alone on a line are used; labels and comments are skipped"""
+        code = _code('api = EC2("api >> fake")', 'db = RDS("DB")', "# cache >> queue", "api >> cach", "db << api", "web")
+
+        defined, used = engine._scan_names(code)
+
+        assert defined == {"api", "db"}
+        assert used == {"api", "db", "cach", "web"}
+
+    def test_truncated_code_keeps_earlier_tokens(self, engine):
+        """A scan cut short by an unterminated string or bracket keeps what it read before"""
+        code = _code('api = EC2("API")', "api >> datab", 'db = RDS("unterminated')
+
+        defined, used = engine._scan_names(code)
+
+        assert {"api"} <= defined
+        assert {"api", "datab"} <= used
+
+    def test_bad_indentation_does_not_stop_scan(self, engine):
+        code = 'with Diagram("x"):\n        api = EC2("API")\n    db = RDS("DB")\n  api >> db\n'
+
+        assert engine._scan_names(code) == ({"api", "db"}, {"api", "db"})
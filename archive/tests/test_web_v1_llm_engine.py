@@ -0,0 +1,89 @@
+"""
+Tests for XML extraction and validation in the archived web_v1 backend
+"""
+
+import os
+import importlib.util
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web_v1", "backend", "llm_engine.py")
+# Loaded under its own name: archive/llm_engine.py is also called llm_engine
+_spec = importlib.util.spec_from_file_location("web_v1_llm_engine", _PATH)
+llm_engine = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(llm_engine)
+
+LLMEngine = llm_engine.LLMEngine
+
+_DIAGRAM = """<mxGraphModel dx="1000" dy="1000" grid="1">
+  <root>
+    <mxCell id="0"/>
+    <mxCell id="1" parent="0"/>
+    <mxCell id="lb" value="Load &amp; Balance" style="rounded=1;html=1;" parent="1" vertex="1">
+      <mxGeometry x="300" y="200" width="60" height="60" as="geometry"/>
+    </mxCell>
+  </root>
+</mxGraphModel>"""
+
+
+def _shape(element):
+    """Tag, attributes, stripped text and children: what a diagram means, ignoring formatting"""
+    return (element.tag, dict(element.attrib), (element.text or "").strip(), [_shape(child) for child in element])
+
+
+def _lxml_backend():
+    lxml_etree = pytest.importorskip("lxml.etree")
+    return lxml_etree, lxml_etree.XMLSyntaxError, lxml_etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+def _elementtree_backend():
+    return ElementTree, ElementTree.ParseError, None
+
+
+@pytest.fixture(params=[_lxml_backend, _elementtree_backend], ids=["lxml", "elementtree"])
+def xml_backend(request, monkeypatch):
+    etree, syntax_error, parser = request.param()
+    monkeypatch.setattr(llm_engine, "etree", etree)
+    monkeypatch.setattr(llm_engine, "_XMLSyntaxError", syntax_error)
+    monkeypatch.setattr(llm_engine, "_XML_PARSER", parser)
+
+
+def test_validate_xml_round_trips(xml_backend):
+    """Re-serialized XML must describe the same diagram"""
+    xml = LLMEngine._validate_xml(_DIAGRAM)
+
+    assert _shape(ElementTree.fromstring(xml)) == _shape(ElementTree.fromstring(_DIAGRAM))
+    assert LLMEngine._validate_xml(xml) == xml
+
+
+@pytest.mark.parametrize("xml", [
+    "<mxGraphModel><root><mxCell id=\"0\"></root></mxGraphModel>",
+    "<mxGraphModel><root/>",
+    "<mxGraphModel a=\"1\" a=\"2\"/>",
+    "<mxGraphModel>&undefined;</mxGraphModel>",
+    "",
+], ids=["mismatched-tag", "unclosed", "duplicate-attribute", "undefined-entity", "empty"])
+def test_validate_xml_rejects_malformed(xml_backend, xml):
+    """Malformed XML must raise ValueError, whichever parser is installed"""
+    with pytest.raises(ValueError, match="malformed XML"):
+        LLMEngine._validate_xml(xml)
+
+
+_STOPPED = _DIAGRAM[:_DIAGRAM.rindex("</mxGraphModel>")]
+
+
+@pytest.mark.parametrize("content", [
+    f"```xml\n{_STOPPED}",
+    f"Here is the diagram:\n```xml\n{_STOPPED}",
+    f"```xml\n{_DIAGRAM}\n```",
+    f"```xml\n{_DIAGRAM}",
+    f"Here is the diagram:\n{_STOPPED}",
+    f"{_DIAGRAM}\nLet me know if you need changes.",
+], ids=["fenced-stopped", "preamble-stopped", "fenced-complete", "fence-stopped", "bare-stopped", "bare-complete"])
+def test_stopped_completion_yields_one_closing_tag(content):
+    """The closing tag dropped by the stop sequence is restored exactly once"""
+    xml = LLMEngine._validate_xml(LLMEngine.__new__(LLMEngine)._extract_xml(content))
+
+    assert xml.count("</mxGraphModel>") == 1
+    assert _shape(ElementTree.fromstring(xml)) == _shape(ElementTree.fromstring(_DIAGRAM))
@@ -1,4 +1,7 @@
 import os
+import sys
+import json
+import hashlib
 # pyrefly: ignore [missing-import]
 from dotenv import load_dotenv
 # pyrefly: ignore [missing-import]
@@ -9,9 +12,21 @@ from diagram_gen import execute_diagram_code
 # Load environment variables
 load_dotenv()
 
-def test_end_to_end():
-    print("1. Testing LLM Connection...")
-    llm = LLMEngine()
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "verify_cache.json")
+
+
+def load_cache():
+    if os.path.exists(CACHE_PATH):
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_cache(cache):
+    with open(CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+
+def test_end_to_end(skip_llm=False):
     prompt = """Design the complete end-to-end system architecture for a global video streaming platform similar to Netflix. The platform must support web, mobile (iOS/Android), smart TV, gaming consoles, and set-top boxes, with millions of concurrent users across multiple continents and strict SLAs for availability, latency, and data consistency where appropriate.
 Describe the architecture in terms of logical components, data flows, and infrastructure. Include all major subsystems and how they interact:
 Clients and Edge Layer
@@ -118,8 +133,24 @@ starting playback, streaming via CDN, and sending telemetry,
 background analytics and ML pipelines,
 multi-region resilience and failover."""
     
+    # Reuse the code generated for this exact prompt on earlier runs
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    cache = load_cache()
+
     try:
-        code = llm.generate_code(prompt)
+        if key in cache:
+            print("1. Using cached LLM output...")
+            code = cache[key]
+        elif skip_llm:
+            print("   [FAILURE] No cached code for this prompt and the LLM is skipped.")
+            return
+        else:
+            print("1. Testing LLM Connection...")
+            llm = LLMEngine()
+            code = llm.generate_code(prompt)
+            if code:
+                cache[key] = code
+                save_cache(cache)
         print("   [SUCCESS] Code generated:")
         print("-" * 40)
         print(code)
@@ -137,4 +168,5 @@ multi-region resilience and failover."""
         print(f"   [FAILURE] Error occurred: {e}")
 
 if __name__ == "__main__":
-    test_end_to_end()
+    # --skip-llm / SKIP_LLM=1 only render cached code, for CI and pre-commit runs
+    test_end_to_end(skip_llm="--skip-llm" in sys.argv[1:] or os.getenv("SKIP_LLM") == "1")
@@ -1,59 +1,64 @@
 import os
+import json
+import asyncio
+import hashlib
+from typing import AsyncIterator, Dict, List, Union
+import logging
 # pyrefly: ignore [missing-import]
-from openai import OpenAI
+import httpx
+# pyrefly: ignore [missing-import]
+import openai
+# pyrefly: ignore [missing-import]
+from openai import AsyncOpenAI
+# pyrefly: ignore [missing-import]
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+# pyrefly: ignore [missing-import]
+from cachetools import TTLCache
 import re
 
-class LLMEngine:
-    def __init__(self):
-        self.api_key = os.getenv("NVIDIA_API_KEY")
-        if not self.api_key:
-            raise ValueError("NVIDIA_API_KEY not found in environment variables")
-        
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=self.api_key
-        )
+try:
+    # pyrefly: ignore [missing-import]
+    from lxml import etree
+    _XMLSyntaxError = etree.XMLSyntaxError
+    _XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+except ImportError:
+    import xml.etree.ElementTree as etree
+    _XMLSyntaxError = etree.ParseError
+    _XML_PARSER = None
 
-    def generate_xml(self, prompt: str) -> str:
-        print(f"DEBUG: Generating XML for prompt: {prompt}")
-        system_prompt = self._get_system_prompt()
-        
-        try:
-            print("DEBUG: Calling NVIDIA NIM API...")
-            response = self.client.chat.completions.create(
-                model="meta/llama-3.1-70b-instruct",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                top_p=0.7,
-                max_tokens=4096,
-            )
-            print("DEBUG: API Response received.")
-        except Exception as e:
-            print(f"ERROR: API Call failed: {e}")
-            raise e
-        
-        content = response.choices[0].message.content
-        print(f"DEBUG: Raw content length: {len(content)}")
-        return self._extract_xml(content)
+try:
+    # pyrefly: ignore [missing-import]
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
 
-    def _extract_xml(self, content: str) -> str:
-        # Extract XML block
-        match = re.search(r'```xml\n(.*?)\n```', content, re.DOTALL)
-        if match:
-            return match.group(1)
-        
-        # Fallback: try to find <mxGraphModel>...</mxGraphModel>
-        match = re.search(r'(<mxGraphModel.*?</mxGraphModel>)', content, re.DOTALL)
-        if match:
-            return match.group(1)
-            
-        return content
+logger = logging.getLogger(__name__)
+
+# Transient NIM failures worth retrying
+_RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# The closing fence may be missing when decoding ends on a stop sequence
+_XML_FENCE_RE = re.compile(r'```xml\n(.*?)(?:\n```|\Z)', re.DOTALL)
+_MXGRAPH_CLOSE = "</mxGraphModel>"
+
+# Decoding stops as soon as the diagram is complete instead of running to max_tokens.
+# Stop strings are not returned, so _extract_xml restores a dropped closing tag.
+_STOP_SEQUENCES = ["\n```\n", _MXGRAPH_CLOSE + "\n"]
+_MIN_MAX_TOKENS = 2048
+_MAX_MAX_TOKENS = 4096
 
-    def _get_system_prompt(self) -> str:
-        return """You are an expert System Design Architect.
+# Generations tried before giving up on malformed XML
+_MAX_XML_ATTEMPTS = 2
+
+# Byte-identical on every request, so server-side prefix caching (vLLM behind NIM) can reuse it
+_SYSTEM_PROMPT = """You are an expert System Design Architect.
 Your goal is to generate a Draw.io XML diagram (mxGraphModel) based on the user's description.
 
 ### Output Format
@@ -154,3 +159,190 @@ Use these exact style strings for components:
 </mxGraphModel>
 ```
 """
+_SYSTEM_MESSAGE = {"role": "system", "content": _SYSTEM_PROMPT}
+
+
+class LLMEngine:
+    def __init__(self):
+        self.api_key = os.getenv("NVIDIA_API_KEY")
+        if not self.api_key:
+            raise ValueError("NVIDIA_API_KEY not found in environment variables")
+        
+        # One pooled client for the whole app, so requests reuse warm TLS connections
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=500),
+            http2=_HTTP2,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        # Retries are handled by _create_completion, not the SDK
+        self.client = AsyncOpenAI(
+            base_url="https://integrate.api.nvidia.com/v1",
+            api_key=self.api_key,
+            max_retries=0,
+            http_client=http_client,
+        )
+        self.model = "meta/llama-3.1-70b-instruct"
+        self.temperature = 0.2
+        self.top_p = 0.7
+        # Extracted XML keyed by request hash; per-process, expires after an hour
+        self._cache = TTLCache(maxsize=1024, ttl=3600)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    def _cache_key(self, prompt: str) -> str:
+        raw = f"{self.model}|{_SYSTEM_PROMPT}|{prompt}|{self.temperature}|{self.top_p}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def generate_xml(self, prompt: str) -> str:
+        logger.debug("Generating XML for prompt: %s", prompt)
+        key = self._cache_key(prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.debug("Cache hit.")
+            return cached
+
+        # Identical prompts already being generated share the same upstream call
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_xml(prompt, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def generate_xml_batch(self, prompts: List[str], concurrency: int = 20) -> List[Union[str, Exception]]:
+        """
+        Generates XML for several prompts concurrently, at most `concurrency` at a time.
+        Results keep the input order; a failed prompt yields its exception.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(prompt: str) -> str:
+            async with sem:
+                return await self.generate_xml(prompt)
+
+        return await asyncio.gather(*[_one(p) for p in prompts], return_exceptions=True)
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_random_exponential(multiplier=0.5, max=10),
+        retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )
+    async def _create_completion(self, prompt: str, **kwargs):
+        """Chat completion call, retried with exponential backoff and jitter."""
+        return await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                _SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_tokens=self._max_tokens(prompt),
+            stop=_STOP_SEQUENCES,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _max_tokens(prompt: str) -> int:
+        """Output budget that grows with the prompt, since longer descriptions mean bigger diagrams."""
+        return min(_MAX_MAX_TOKENS, _MIN_MAX_TOKENS + len(prompt) // 4)
+
+    async def _fetch_xml(self, prompt: str, key: str) -> str:
+        for attempt in range(1, _MAX_XML_ATTEMPTS + 1):
+            try:
+                logger.debug("Calling NVIDIA NIM API...")
+                response = await self._create_completion(prompt)
+                logger.debug("API Response received.")
+            except Exception as e:
+                logger.error("API Call failed: %s", e)
+                raise
+            
+            content = response.choices[0].message.content
+            logger.debug("Raw content length: %d", len(content))
+            try:
+                xml = self._validate_xml(self._extract_xml(content))
+                break
+            except ValueError as e:
+                if attempt == _MAX_XML_ATTEMPTS:
+                    raise
+                logger.warning("Retrying after %s", e)
+        self._cache[key] = xml
+        return xml
+
+    async def stream_xml(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yields server-sent events: one "token" event per streamed chunk, then a
+        final "xml" event with the XML extracted from the full response.
+        """
+        key = self._cache_key(prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            yield self._sse({"type": "xml", "xml": cached})
+            return
+
+        try:
+            stream = await self._create_completion(prompt, stream=True)
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    parts.append(delta)
+                    yield self._sse({"type": "token", "content": delta})
+        except Exception as e:
+            logger.error("API Call failed: %s", e)
+            yield self._sse({"type": "error", "error": str(e)})
+            return
+
+        try:
+            xml = self._validate_xml(self._extract_xml("".join(parts)))
+        except ValueError as e:
+            yield self._sse({"type": "error", "error": str(e)})
+            return
+        self._cache[key] = xml
+        yield self._sse({"type": "xml", "xml": xml})
+
+    @staticmethod
+    def _sse(event: dict) -> str:
+        return f"data: {json.dumps(event)}\n\n"
+
+    def _extract_xml(self, content: str) -> str:
+        # Extract XML block (only run the regex if the fence is present at all)
+        if content.find('```xml') >= 0:
+            match = _XML_FENCE_RE.search(content)
+            if match:
+                return self._close_xml(match.group(1))
+        
+        # Fallback: try to find <mxGraphModel>...</mxGraphModel>
+        start = content.find('<mxGraphModel')
+        if start >= 0:
+            end = content.find(_MXGRAPH_CLOSE, start)
+            if end >= 0:
+                return content[start:end + len(_MXGRAPH_CLOSE)]
+            return self._close_xml(content[start:])
+            
+        return content
+
+    @staticmethod
+    def _validate_xml(xml: str) -> str:
+        """
+        Parses the extracted XML and returns it re-serialized, so clients get
+        deterministic markup. Raises ValueError if it is not well-formed.
+        """
+        try:
+            root = etree.fromstring(xml.encode("utf-8"), _XML_PARSER)
+        except _XMLSyntaxError as e:
+            raise ValueError(f"Model returned malformed XML: {e}") from e
+        return etree.tostring(root, encoding="unicode")
+
+    @staticmethod
+    def _close_xml(xml: str) -> str:
+        # The "</mxGraphModel>" stop sequence is cut from the response, put it back
+        if xml.find(_MXGRAPH_CLOSE) < 0 and xml.find('<mxGraphModel') >= 0:
+            return xml.rstrip() + "\n" + _MXGRAPH_CLOSE
+        return xml
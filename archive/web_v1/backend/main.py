@@ -1,9 +1,16 @@
 # pyrefly: ignore [missing-import]
 from fastapi import FastAPI, HTTPException
+# pyrefly: ignore [missing-import]
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+from contextlib import asynccontextmanager
 # pyrefly: ignore [missing-import]
 from fastapi.middleware.cors import CORSMiddleware
+# pyrefly: ignore [missing-import]
+from fastapi.middleware.gzip import GZipMiddleware
 import os
+import logging
 # pyrefly: ignore [missing-import]
 from dotenv import load_dotenv
 # pyrefly: ignore [missing-import]
@@ -11,30 +18,70 @@ from llm_engine import LLMEngine
 
 load_dotenv()
 
-app = FastAPI(title="Arcgen Backend")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Created inside the running loop so its connection pool lives as long as the app
+    app.state.llm = LLMEngine()
+    yield
+    await app.state.llm.aclose()
+
+app = FastAPI(title="Arcgen Backend", lifespan=lifespan)
 
 # Allow CORS for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origin
+    allow_origins=os.getenv("CORS_ORIGINS", "http://localhost:3000").split(","),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# mxGraphModel XML is very repetitive markup; event streams are left uncompressed
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=6)
+
 class PromptRequest(BaseModel):
     prompt: str
 
-llm_engine = LLMEngine()
+class BatchPromptRequest(BaseModel):
+    prompts: List[str]
+
+# Declared response models let FastAPI serialize straight to JSON bytes in pydantic-core
+class XMLResponse(BaseModel):
+    xml: str
 
-@app.post("/generate")
+class BatchItem(BaseModel):
+    xml: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
+_HEALTH_BODY = b'{"status":"ok"}'
+
+@app.post("/generate", response_model=XMLResponse)
 async def generate_diagram(request: PromptRequest):
     try:
-        xml_data = llm_engine.generate_xml(request.prompt)
-        return {"xml": xml_data}
+        xml_data = await app.state.llm.generate_xml(request.prompt)
+        return XMLResponse(xml=xml_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate_batch", response_model=BatchResponse, response_model_exclude_none=True)
+async def generate_diagram_batch(request: BatchPromptRequest):
+    results = await app.state.llm.generate_xml_batch(request.prompts)
+    return BatchResponse(results=[
+        BatchItem(error=str(r)) if isinstance(r, Exception) else BatchItem(xml=r)
+        for r in results
+    ])
+
+@app.post("/generate-stream")
+async def generate_diagram_stream(request: PromptRequest):
+    # Tokens are forwarded as they arrive; the last event carries the parsed XML
+    return StreamingResponse(app.state.llm.stream_xml(request.prompt), media_type="text/event-stream")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    # Constant body, no validation or serialization needed
+    return Response(content=_HEALTH_BODY, media_type="application/json")
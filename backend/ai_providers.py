@@ -6,16 +6,42 @@ Supports OpenAI, Anthropic, Google, Azure, Ollama, and NVIDIA
 
 import os
 from enum import Enum
-from typing import Optional, Dict, Any, List, AsyncGenerator
-from pydantic import BaseModel
+from types import MappingProxyType, SimpleNamespace
+from typing import Optional, Dict, Any, List, AsyncGenerator, Final, Mapping
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict
+import re
 import json
+import logging
+import asyncio
+import hashlib
+import functools
+import threading
+import httpx
 import openai
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 import google.generativeai as genai
 from tools import get_tools_for_ai, validate_tool_call, shape_library_manager
 from azure.identity import DefaultAzureCredential
 from azure.core.credentials import AzureKeyCredential
-from ollama import Client as OllamaClient
+from ollama import AsyncClient as OllamaClient
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+# Inline XML in a text reply: from the first <mxCell up to the earliest end marker
+_XML_EXTRACT_RE = re.compile(r"(<mxCell.*?)(?:```|</mxGraphModel>|\n\n|\Z)", re.DOTALL)
 
 
 class Provider(str, Enum):
@@ -28,7 +54,8 @@ class Provider(str, Enum):
     NVIDIA = "nvidia"
 
 
-class AIModelConfig(BaseModel):
+@dataclass(slots=True, frozen=True)
+class AIModelConfig:
     """Configuration for AI model"""
     provider: Provider
     model_id: str
@@ -42,6 +69,8 @@ class AIModelConfig(BaseModel):
 
 class ClientOverrides(BaseModel):
     """Client-side overrides for provider configuration"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     provider: Optional[str] = None
     api_key: Optional[str] = None
     base_url: Optional[str] = None
@@ -59,150 +88,32 @@ PROVIDER_ENV_VARS = {
     Provider.NVIDIA: "NVIDIA_API_KEY",
 }
 
-# Allowed client-provided providers (for security)
-ALLOWED_CLIENT_PROVIDERS = [
-    Provider.OPENAI,
-    Provider.ANTHROPIC,
-    Provider.GOOGLE,
-    Provider.AZURE,
-    Provider.NVIDIA,
-]
-
-
-class AIProviderManager:
-    """Manages multiple AI providers and their clients"""
-
-    def __init__(self):
-        self._clients = {}
-        self._current_config: Optional[AIModelConfig] = None
-
-    def get_model_config(self, overrides: Optional[ClientOverrides] = None) -> AIModelConfig:
-        """Get AI model configuration with optional overrides"""
-
-        # Determine provider
-        provider_str = overrides.provider if overrides and overrides.provider else os.getenv("AI_PROVIDER", "nvidia")
-        try:
-            provider = Provider(provider_str.lower())
-        except ValueError:
-            provider = Provider.NVIDIA
-
-        # Get model ID
-        model_id = overrides.model_id if overrides and overrides.model_id else os.getenv("AI_MODEL")
-        if not model_id:
-            # Default models for each provider
-            default_models = {
-                Provider.OPENAI: "gpt-4o",
-                Provider.ANTHROPIC: "claude-3-5-sonnet-20241022",
-                Provider.GOOGLE: "gemini-pro",
-                Provider.AZURE: "gpt-4o",
-                Provider.OLLAMA: "llama3.2",
-                Provider.NVIDIA: "meta/llama-3.1-70b-instruct",
-            }
-            model_id = default_models.get(provider, "meta/llama-3.1-70b-instruct")
-
-        # Get API key (client override takes precedence for security)
-        api_key = None
-        if overrides and overrides.api_key:
-            api_key = overrides.api_key
-        else:
-            env_var = PROVIDER_ENV_VARS.get(provider)
-            if env_var:
-                api_key = os.getenv(env_var)
-
-        # Get base URL
-        base_url = overrides.base_url if overrides and overrides.base_url else None
-        if not base_url:
-            # Default base URLs
-            default_urls = {
-                Provider.OPENAI: "https://api.openai.com/v1",
-                Provider.ANTHROPIC: "https://api.anthropic.com",
-                Provider.GOOGLE: "https://generativelanguage.googleapis.com",
-                Provider.AZURE: None,  # Uses resource name
-                Provider.OLLAMA: "http://localhost:11434",
-                Provider.NVIDIA: "https://integrate.api.nvidia.com/v1",
-            }
-            base_url = default_urls.get(provider)
-
-        # Get temperature
-        temperature = overrides.temperature if overrides and overrides.temperature else float(os.getenv("TEMPERATURE", "0.2"))
-
-        config = AIModelConfig(
-            provider=provider,
-            model_id=model_id,
-            api_key=api_key,
-            base_url=base_url,
-            temperature=temperature,
-        )
-
-        self._current_config = config
-        return config
-
-    def get_client(self, config: AIModelConfig):
-        """Get or create client for the given configuration"""
-        cache_key = f"{config.provider.value}:{config.model_id}:{config.base_url}"
-
-        if cache_key in self._clients:
-            return self._clients[cache_key]
-
-        client = None
-
-        try:
-            if config.provider == Provider.OPENAI:
-                client = openai.OpenAI(
-                    api_key=config.api_key,
-                    base_url=config.base_url,
-                )
-            elif config.provider == Provider.ANTHROPIC:
-                client = Anthropic(
-                    api_key=config.api_key,
-                    base_url=config.base_url,
-                )
-            elif config.provider == Provider.GOOGLE:
-                genai.configure(api_key=config.api_key)
-                client = genai.GenerativeModel(config.model_id)
-            elif config.provider == Provider.AZURE:
-                # Azure OpenAI setup
-                if config.base_url:
-                    client = openai.AzureOpenAI(
-                        api_key=config.api_key,
-                        azure_endpoint=config.base_url,
-                        api_version="2024-02-01",
-                    )
-                else:
-                    # Use resource name approach
-                    resource_name = os.getenv("AZURE_RESOURCE_NAME")
-                    if resource_name:
-                        client = openai.AzureOpenAI(
-                            api_key=config.api_key,
-                            azure_endpoint=f"https://{resource_name}.openai.azure.com/",
-                            api_version="2024-02-01",
-                        )
-            elif config.provider == Provider.OLLAMA:
-                client = OllamaClient(host=config.base_url or "http://localhost:11434")
-            elif config.provider == Provider.NVIDIA:
-                # NVIDIA uses OpenAI-compatible API
-                client = openai.OpenAI(
-                    api_key=config.api_key,
-                    base_url=config.base_url,
-                )
-
-        except Exception as e:
-            raise ValueError(f"Failed to initialize {config.provider.value} client: {str(e)}")
-
-        if client:
-            self._clients[cache_key] = client
-
-        return client
-
-    async def generate_diagram(self, prompt: str, config: AIModelConfig) -> Dict[str, Any]:
-        """Generate diagram using tool-based architecture"""
-        client = self.get_client(config)
-
-        if not client:
-            raise ValueError(f"No client available for provider {config.provider.value}")
-
-        # Enhanced system prompt with tool instructions
-        system_prompt = """You are an expert diagram creation assistant specializing in draw.io XML generation.
+_PROVIDER_BY_NAME: Final[Dict[str, Provider]] = {p.value: p for p in Provider}
+
+# Default model and base URL for each provider, the single source of truth for both
+_FALLBACK_MODEL: Final[str] = "meta/llama-3.1-70b-instruct"
+
+_DEFAULT_MODELS: Final[Mapping[Provider, str]] = MappingProxyType({
+    Provider.OPENAI: "gpt-4o",
+    Provider.ANTHROPIC: "claude-3-5-sonnet-20241022",
+    Provider.GOOGLE: "gemini-pro",
+    Provider.AZURE: "gpt-4o",
+    Provider.OLLAMA: "llama3.2",
+    Provider.NVIDIA: "meta/llama-3.1-70b-instruct",
+})
+
+_DEFAULT_BASE_URLS: Final[Mapping[Provider, Optional[str]]] = MappingProxyType({
+    Provider.OPENAI: "https://api.openai.com/v1",
+    Provider.ANTHROPIC: "https://api.anthropic.com",
+    Provider.GOOGLE: "https://generativelanguage.googleapis.com",
+    Provider.AZURE: None,  # Uses resource name
+    Provider.OLLAMA: "http://localhost:11434",
+    Provider.NVIDIA: "https://integrate.api.nvidia.com/v1",
+})
+
+# Enhanced system prompt with tool instructions. Kept byte-identical across
+# requests so provider-side prefix caching can reuse it.
+_SYSTEM_PROMPT: Final[str] = """You are an expert diagram creation assistant specializing in draw.io XML generation.
 Your primary function is creating clear, well-organized visual diagrams through precise XML specifications.
 
 When you are asked to create a diagram, briefly describe your plan about the layout and structure to avoid object overlapping or edge crossing the objects. (2-3 sentences max), then use display_diagram tool to generate the XML.
@@ -265,21 +176,303 @@ For cloud/tech diagrams, ALWAYS call get_shape_library first to discover availab
 - Kubernetes: Use "shape=mxgraph.kubernetes.pod" for pods
 
 This ensures your diagrams use authentic, professional cloud service icons instead of generic shapes."""
+# Google gets the system prompt inline, ahead of the user message
+_GOOGLE_PREFIX: Final[str] = _SYSTEM_PROMPT + "\n\nUser: "
+_SYSTEM_PROMPT_SHA256 = hashlib.sha256(_SYSTEM_PROMPT.encode("utf-8")).hexdigest()
+
+# Allowed client-provided providers (for security)
+ALLOWED_CLIENT_PROVIDERS = [
+    Provider.OPENAI,
+    Provider.ANTHROPIC,
+    Provider.GOOGLE,
+    Provider.AZURE,
+    Provider.NVIDIA,
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _tools_for(provider: str) -> List[Dict[str, Any]]:
+    """Tool schemas for a provider, built once. Read-only, shared across requests."""
+    return get_tools_for_ai(provider)
+
+
+@functools.lru_cache(maxsize=1)
+def _env_snapshot() -> Dict[str, str]:
+    """Provider settings from the environment, read once"""
+    keys = ["AI_PROVIDER", "AI_MODEL", "TEMPERATURE"] + [v for v in PROVIDER_ENV_VARS.values() if v]
+    return {key: os.environ[key] for key in keys if key in os.environ}
+
+
+def _pick(override_val, env_key: Optional[str], default=None):
+    """Client override first, then the environment, then the default"""
+    if override_val is not None and override_val != "":
+        return override_val
+    if env_key:
+        return _env_snapshot().get(env_key) or default
+    return default
+
+
+def _resolve_config(overrides: ClientOverrides) -> AIModelConfig:
+    """Build a config, letting client overrides take precedence over the environment"""
+    provider = _PROVIDER_BY_NAME.get(_pick(overrides.provider, "AI_PROVIDER", "nvidia").lower(), Provider.NVIDIA)
+
+    return AIModelConfig(
+        provider=provider,
+        model_id=_pick(overrides.model_id, "AI_MODEL", _DEFAULT_MODELS.get(provider, _FALLBACK_MODEL)),
+        # Client override takes precedence for security
+        api_key=_pick(overrides.api_key, PROVIDER_ENV_VARS.get(provider)),
+        base_url=_pick(overrides.base_url, None, _DEFAULT_BASE_URLS.get(provider)),
+        temperature=float(_pick(overrides.temperature, "TEMPERATURE", "0.2")),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _default_config() -> AIModelConfig:
+    """Config used when the client sends no overrides"""
+    return _resolve_config(ClientOverrides())
+
+
+def reload_env_config():
+    """Re-read provider settings from the environment on the next request"""
+    _env_snapshot.cache_clear()
+    _default_config.cache_clear()
+
+
+@functools.lru_cache(maxsize=64)
+def _library_info(library: str) -> Optional[Dict[str, Any]]:
+    """Shape library documentation for a get_shape_library call, looked up once per name"""
+    return shape_library_manager.get_library_info(library)
+
+
+_genai_lock = threading.Lock()
+_genai_api_key: Optional[str] = None
+_genai_models: Dict[str, Any] = {}
+
+
+def _genai_model(model_id: str, api_key: Optional[str]):
+    """
+    One shared GenerativeModel per model id. The SDK's API key is process-global,
+    so a different key reconfigures it and drops the models built under the old one.
+    """
+    global _genai_api_key
+    with _genai_lock:
+        if api_key != _genai_api_key:
+            genai.configure(api_key=api_key)
+            _genai_api_key = api_key
+            _genai_models.clear()
+        model = _genai_models.get(model_id)
+        if model is None:
+            model = _genai_models[model_id] = genai.GenerativeModel(model_id)
+        return model
+
+
+@functools.lru_cache(maxsize=32)
+def _build_client(provider: Provider, model_id: str, base_url: Optional[str], api_key: Optional[str],
+                  http_client: httpx.AsyncClient):
+    """
+    Create an SDK client. Cached per (provider, model, base_url, api_key), so
+    configs with different client-supplied keys never share a client and the
+    least recently used ones are dropped instead of piling up.
+    """
+    if provider == Provider.OPENAI:
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+        )
+    elif provider == Provider.ANTHROPIC:
+        # Keeps its own pool: newer SDK releases reject a plain httpx client
+        return AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+        )
+    elif provider == Provider.AZURE:
+        # Azure OpenAI setup
+        if base_url:
+            azure_endpoint = base_url
+        else:
+            # Use resource name approach
+            resource_name = os.getenv("AZURE_RESOURCE_NAME")
+            if not resource_name:
+                # Raised rather than returned so the missing endpoint is not cached
+                raise ValueError("AZURE_BASE_URL or AZURE_RESOURCE_NAME must be set")
+            azure_endpoint = f"https://{resource_name}.openai.azure.com/"
+        return openai.AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=azure_endpoint,
+            api_version="2024-02-01",
+            http_client=http_client,
+        )
+    elif provider == Provider.OLLAMA:
+        return OllamaClient(host=base_url or "http://localhost:11434")
+    elif provider == Provider.NVIDIA:
+        # NVIDIA uses OpenAI-compatible API
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+        )
+    return None
+
+
+class AIProviderManager:
+    """Manages multiple AI providers and their clients"""
+
+    def __init__(self):
+        self._current_config: Optional[AIModelConfig] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._available_providers: Optional[tuple] = None
+        logger.info("System prompt sha256=%s", _SYSTEM_PROMPT_SHA256)
+        # Shared by the OpenAI-compatible clients so calls to the same host reuse warm TLS connections
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=32, keepalive_expiry=90),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            http2=_HTTP2,
+        )
+
+    async def aclose(self):
+        """Close the shared HTTP connection pool"""
+        await self._http.aclose()
+
+    async def warm_up(self, providers: Optional[List[Provider]] = None):
+        """
+        Build clients and open connections ahead of the first request, for every
+        configured provider in providers (all by default). Failures are only logged.
+        """
+        async def _warm(provider: Provider):
+            try:
+                config = self.get_model_config(ClientOverrides(provider=provider.value))
+                self.get_client(config)
+                if config.base_url:
+                    await self._http.head(config.base_url)
+            except Exception as e:
+                logger.warning("Warm-up failed for %s: %s", provider.value, e)
+
+        await asyncio.gather(*[
+            _warm(p) for p in (providers or list(Provider)) if self.validate_provider_config(p)
+        ])
+
+    def get_model_config(self, overrides: Optional[ClientOverrides] = None) -> AIModelConfig:
+        """Get AI model configuration with optional overrides"""
+        if overrides is None:
+            # Server-side defaults repeat on every request, reuse the validated model
+            config = _default_config()
+        else:
+            config = _resolve_config(overrides)
+
+        self._current_config = config
+        return config
+
+    def get_client(self, config: AIModelConfig):
+        """Get or create client for the given configuration"""
+        # Fail fast, before any client is built or cached
+        if config.provider == Provider.AZURE and not self.validate_provider_config(
+                Provider.AZURE, config.api_key, config.base_url):
+            raise ValueError("Azure requires an API key and AZURE_BASE_URL or AZURE_RESOURCE_NAME")
 
         try:
-            # Make the tool call
-            tool_result = await self._call_with_tools(
+            if config.provider == Provider.GOOGLE:
+                # Not cached with the others: every call must reconfigure genai for its own key
+                return _genai_model(config.model_id, config.api_key)
+            return _build_client(config.provider, config.model_id, config.base_url, config.api_key, self._http)
+        except Exception as e:
+            raise ValueError(f"Failed to initialize {config.provider.value} client: {str(e)}")
+
+    async def generate_diagram(self, prompt: str, config: AIModelConfig) -> Dict[str, Any]:
+        """Generate diagram using tool-based architecture"""
+        client = self.get_client(config)
+
+        if not client:
+            raise ValueError(f"No client available for provider {config.provider.value}")
+
+        system_prompt = _SYSTEM_PROMPT
+
+        # Identical requests already in flight share one upstream call
+        key = hashlib.sha256(
+            f"{config.provider.value}|{config.model_id}|{config.base_url}|{config.api_key}|"
+            f"{config.temperature}|{prompt}".encode("utf-8")
+        ).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_with_tools(
                 client=client,
                 config=config,
                 system_prompt=system_prompt,
                 user_prompt=prompt
+            ))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        try:
+            # Shielded so one caller disconnecting does not cancel the call for the others
+            return await asyncio.shield(task)
+
+        except Exception as e:
+            raise ValueError(f"Failed to generate diagram with {config.provider.value}: {str(e)}")
+
+    async def generate_diagram_stream(self, prompt: str, config: AIModelConfig,
+                                      tool_name: Optional[str] = "display_diagram") -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream a diagram while it is generated. Yields {"type": "delta", "content": ...}
+        for each tool-argument fragment, then the parsed result as generate_diagram returns it.
+        Pinning tool_name skips the model's tool choice; None lets the model decide.
+        Providers without tool streaming yield the generate_diagram result once.
+        """
+        if config.provider not in (Provider.OPENAI, Provider.NVIDIA, Provider.AZURE):
+            yield await self.generate_diagram(prompt, config)
+            return
+
+        client = self.get_client(config)
+
+        if not client:
+            raise ValueError(f"No client available for provider {config.provider.value}")
+
+        tool_choice = {"type": "function", "function": {"name": tool_name}} if tool_name else "auto"
+        called_tool = None
+        arguments = []
+        text = []
+
+        try:
+            response = await client.chat.completions.create(
+                model=config.model_id,
+                messages=[
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=config.temperature,
+                max_tokens=config.max_tokens,
+                tools=_tools_for(config.provider.value),
+                tool_choice=tool_choice,
+                stream=True
             )
 
-            return tool_result
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    for call in delta.tool_calls:
+                        # Only the first tool call is used, as in _process_tool_calls
+                        if call.index != 0 or not call.function:
+                            continue
+                        if call.function.name:
+                            called_tool = call.function.name
+                        if call.function.arguments:
+                            arguments.append(call.function.arguments)
+                            yield {"type": "delta", "content": call.function.arguments}
+                elif delta.content:
+                    text.append(delta.content)
 
         except Exception as e:
             raise ValueError(f"Failed to generate diagram with {config.provider.value}: {str(e)}")
 
+        if called_tool is None:
+            yield {"type": "text", "content": "".join(text)}
+            return
+
+        tool_call = SimpleNamespace(function=SimpleNamespace(name=called_tool, arguments="".join(arguments)))
+        yield await self._process_tool_calls([tool_call])
+
     async def _call_with_tools(self, client, config: AIModelConfig, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Make AI call with tool support"""
         messages = [
@@ -287,10 +480,10 @@ This ensures your diagrams use authentic, professional cloud service icons inste
             {"role": "user", "content": user_prompt}
         ]
 
-        tools = get_tools_for_ai(config.provider.value)
+        tools = _tools_for(config.provider.value)
 
         if config.provider == Provider.OPENAI or config.provider == Provider.NVIDIA:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=config.model_id,
                 messages=messages,
                 temperature=config.temperature,
@@ -308,39 +501,22 @@ This ensures your diagrams use authentic, professional cloud service icons inste
 
             # Fallback: check if the response contains XML directly
             content = message.content or ""
-            if "<mxCell" in content and "vertex=" in content:
-                # Extract XML from response
-                start = content.find("<mxCell")
-                if start >= 0:
-                    xml_content = content[start:]
-                    # Clean up any trailing content
-                    end_markers = ["```", "</mxGraphModel>", "\n\n"]
-                    for marker in end_markers:
-                        end_pos = xml_content.find(marker)
-                        if end_pos >= 0:
-                            xml_content = xml_content[:end_pos]
-                    return {"type": "display_diagram", "xml": xml_content.strip()}
+            match = _XML_EXTRACT_RE.search(content)
+            if match and "vertex=" in match.group(1):
+                return {"type": "display_diagram", "xml": match.group(1).strip()}
 
             # Final fallback to text response
             return {"type": "text", "content": content}
 
         elif config.provider == Provider.ANTHROPIC:
-            # Anthropic tool calling setup
-            tools_for_anthropic = []
-            for tool in tools:
-                tools_for_anthropic.append({
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "input_schema": tool["parameters"]
-                })
-
+            # get_tools_for_ai already returns the Anthropic schema (input_schema) for this provider
             response = await client.messages.create(
                 model=config.model_id,
                 max_tokens=config.max_tokens,
                 temperature=config.temperature,
                 system=system_prompt,
                 messages=[{"role": "user", "content": user_prompt}],
-                tools=tools_for_anthropic,
+                tools=tools,
                 tool_choice={"type": "auto"}
             )
 
@@ -352,8 +528,9 @@ This ensures your diagrams use authentic, professional cloud service icons inste
 
         elif config.provider == Provider.GOOGLE:
             # Google doesn't support tools well, fallback to text
+            prefix = _GOOGLE_PREFIX if system_prompt is _SYSTEM_PROMPT else system_prompt + "\n\nUser: "
             response = await client.generate_content_async(
-                contents=[{"parts": [{"text": f"{system_prompt}\n\nUser: {user_prompt}"}]}],
+                contents=[{"parts": [{"text": prefix + user_prompt}]}],
                 generation_config=genai.types.GenerationConfig(
                     temperature=config.temperature,
                     max_output_tokens=config.max_tokens,
@@ -362,7 +539,7 @@ This ensures your diagrams use authentic, professional cloud service icons inste
             return {"type": "text", "content": response.text}
 
         elif config.provider == Provider.AZURE:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=config.model_id,
                 messages=messages,
                 temperature=config.temperature,
@@ -379,7 +556,7 @@ This ensures your diagrams use authentic, professional cloud service icons inste
 
         elif config.provider == Provider.OLLAMA:
             # Ollama doesn't support tools, fallback to text
-            response = client.chat(
+            response = await client.chat(
                 model=config.model_id,
                 messages=messages,
                 options={
@@ -394,78 +571,73 @@ This ensures your diagrams use authentic, professional cloud service icons inste
 
     async def _process_tool_calls(self, tool_calls) -> Dict[str, Any]:
         """Process tool calls from OpenAI/Azure style responses"""
-        results = []
-
-        for tool_call in tool_calls:
-            tool_name = tool_call.function.name
-            tool_args = json.loads(tool_call.function.arguments)
+        calls = [(tool_call.function.name, _json_loads(tool_call.function.arguments)) for tool_call in tool_calls]
+        return await self._run_tools(calls, "Tool call processed")
 
-            if tool_name == "display_diagram":
-                # Return the XML directly
-                return {
-                    "type": "display_diagram",
-                    "xml": tool_args["xml"]
-                }
+    async def _process_anthropic_tool_calls(self, content) -> Dict[str, Any]:
+        """Process tool calls from Anthropic responses"""
+        calls = [(item.name, item.input) for item in content if item.type == "tool_use"]
+        return await self._run_tools(calls, "No tool calls found")
+
+    async def _run_tools(self, calls, empty_message: str) -> Dict[str, Any]:
+        """
+        Run every (tool_name, tool_args) call concurrently. A single result keeps its
+        own shape; several come back as {"type": "batch", "ops": [...]} in call order.
+        A call that fails becomes an "error" op without affecting the others.
+        """
+        results = await asyncio.gather(
+            *[self._run_tool(name, args) for name, args in calls], return_exceptions=True
+        )
+        ops = []
+        for (name, _), result in zip(calls, results):
+            if isinstance(result, Exception):
+                logger.warning("Tool call %s failed: %s", name, result)
+                result = {"type": "error", "tool": name, "error": str(result)}
+            if result is not None:
+                ops.append(result)
+
+        if not ops:
+            # If no specific tool result, return general response
+            return {"type": "text", "content": empty_message}
+        if len(ops) == 1:
+            return ops[0]
+        return {"type": "batch", "ops": ops}
+
+    async def _run_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if tool_name == "display_diagram":
+            # Return the XML directly
+            return {
+                "type": "display_diagram",
+                "xml": tool_args["xml"]
+            }
 
-            elif tool_name == "edit_diagram":
-                # Return edit operations
-                return {
-                    "type": "edit_diagram",
-                    "edits": tool_args["edits"]
-                }
+        elif tool_name == "edit_diagram":
+            # Return edit operations
+            return {
+                "type": "edit_diagram",
+                "edits": tool_args["edits"]
+            }
 
-            elif tool_name == "append_diagram":
-                # Return append operation
-                return {
-                    "type": "append_diagram",
-                    "xml": tool_args["xml"]
-                }
+        elif tool_name == "append_diagram":
+            # Return append operation
+            return {
+                "type": "append_diagram",
+                "xml": tool_args["xml"]
+            }
 
-            elif tool_name == "get_shape_library":
-                # Return shape library info
-                library_info = shape_library_manager.get_library_info(tool_args["library"])
-                return {
-                    "type": "shape_library",
-                    "library": tool_args["library"],
-                    "info": library_info
-                }
+        elif tool_name == "get_shape_library":
+            # Return shape library info
+            library_info = _library_info(tool_args["library"])
+            return {
+                "type": "shape_library",
+                "library": tool_args["library"],
+                "info": library_info
+            }
 
-        # If no specific tool result, return general response
-        return {"type": "text", "content": "Tool call processed"}
+        return None
 
-    async def _process_anthropic_tool_calls(self, content) -> Dict[str, Any]:
-        """Process tool calls from Anthropic responses"""
-        for item in content:
-            if item.type == "tool_use":
-                tool_name = item.name
-                tool_args = item.input
-
-                if tool_name == "display_diagram":
-                    return {
-                        "type": "display_diagram",
-                        "xml": tool_args["xml"]
-                    }
-                elif tool_name == "edit_diagram":
-                    return {
-                        "type": "edit_diagram",
-                        "edits": tool_args["edits"]
-                    }
-                elif tool_name == "append_diagram":
-                    return {
-                        "type": "append_diagram",
-                        "xml": tool_args["xml"]
-                    }
-                elif tool_name == "get_shape_library":
-                    library_info = shape_library_manager.get_library_info(tool_args["library"])
-                    return {
-                        "type": "shape_library",
-                        "library": tool_args["library"],
-                        "info": library_info
-                    }
-
-        return {"type": "text", "content": "No tool calls found"}
-
-    def validate_provider_config(self, provider: Provider, api_key: Optional[str] = None) -> bool:
+    def validate_provider_config(self, provider: Provider, api_key: Optional[str] = None,
+                                 base_url: Optional[str] = None) -> bool:
         """Validate that provider configuration is complete"""
         if provider == Provider.OLLAMA:
             return True  # No API key needed
@@ -475,7 +647,7 @@ This ensures your diagrams use authentic, professional cloud service icons inste
             return False
 
         if provider == Provider.AZURE:
-            has_base_url = bool(os.getenv("AZURE_BASE_URL"))
+            has_base_url = bool(base_url or os.getenv("AZURE_BASE_URL"))
             has_resource_name = bool(os.getenv("AZURE_RESOURCE_NAME"))
             return has_base_url or has_resource_name
 
@@ -483,6 +655,17 @@ This ensures your diagrams use authentic, professional cloud service icons inste
 
     def get_available_providers(self) -> List[Dict[str, Any]]:
         """Get list of available providers with their status"""
+        # Only depends on env vars, so it is built once until refresh()
+        if self._available_providers is None:
+            self._available_providers = tuple(self._build_available_providers())
+        return list(self._available_providers)
+
+    def refresh(self):
+        """Pick up changed provider env vars"""
+        reload_env_config()
+        self._available_providers = None
+
+    def _build_available_providers(self) -> List[Dict[str, Any]]:
         providers = []
 
         for provider in Provider:
@@ -492,23 +675,11 @@ This ensures your diagrams use authentic, professional cloud service icons inste
                 "label": provider.value.title(),
                 "configured": is_configured,
                 "requires_key": provider != Provider.OLLAMA,
-                "default_model": self._get_default_model(provider),
+                "default_model": _DEFAULT_MODELS.get(provider, _FALLBACK_MODEL),
             })
 
         return providers
 
-    def _get_default_model(self, provider: Provider) -> str:
-        """Get default model for provider"""
-        defaults = {
-            Provider.OPENAI: "gpt-4o",
-            Provider.ANTHROPIC: "claude-3-5-sonnet-20241022",
-            Provider.GOOGLE: "gemini-pro",
-            Provider.AZURE: "gpt-4o",
-            Provider.OLLAMA: "llama3.2",
-            Provider.NVIDIA: "meta/llama-3.1-70b-instruct",
-        }
-        return defaults.get(provider, "gpt-4o")
-
 
 # Global instance
 ai_provider_manager = AIProviderManager()
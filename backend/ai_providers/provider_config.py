@@ -5,6 +5,8 @@ Maps provider names to environment variables and configuration options.
 Based on next-ai-draw-io provider system.
 """
 
+import os
+from functools import lru_cache
 from typing import Dict, Optional, Literal
 from dataclasses import dataclass
 
@@ -123,6 +125,20 @@ PROVIDER_CONFIGS: Dict[str, ProviderConfig] = {
 }
 
 
+@lru_cache(maxsize=None)
+def env(name: str) -> Optional[str]:
+    """
+    Cached os.getenv. Environment variables don't change while serving requests,
+    so each one is read once; call clear_env_cache() after changing them.
+    """
+    return os.environ.get(name)
+
+
+def clear_env_cache() -> None:
+    """Forget cached environment variables so the next lookup re-reads them"""
+    env.cache_clear()
+
+
 # Default base URLs for providers
 DEFAULT_BASE_URLS: Dict[str, str] = {
     "anthropic": "https://api.anthropic.com/v1",
@@ -142,6 +158,7 @@ REASONING_MODELS = {
 }
 
 
+@lru_cache(maxsize=None)
 def get_provider_config(provider: str) -> ProviderConfig:
     """
     Get configuration for a provider
@@ -164,6 +181,7 @@ def get_provider_config(provider: str) -> ProviderConfig:
     return PROVIDER_CONFIGS[provider]
 
 
+@lru_cache(maxsize=256)
 def supports_reasoning(provider: str, model: str) -> bool:
     """
     Check if a model supports reasoning/thinking mode
@@ -5,22 +5,118 @@ Central manager for all AI providers with auto-detection and security features.
 Supports OpenAI, Anthropic, Google, Azure, Bedrock, Ollama, and more.
 """
 
-import os
-from typing import Optional, Dict, Any, Tuple
-from openai import OpenAI, AsyncOpenAI
-from anthropic import Anthropic, AsyncAnthropic
-import google.generativeai as genai
+import hashlib
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Tuple, ClassVar, Callable, Mapping
 
 from .provider_config import (
     ProviderName,
+    ProviderConfig,
     PROVIDER_CONFIGS,
     DEFAULT_BASE_URLS,
     get_provider_config,
     supports_reasoning,
+    env,
+    clear_env_cache,
 )
 from .security import validate_custom_endpoint, validate_url_safety, SecurityError
 
 
+_SENTINEL = object()
+
+# SDKs are imported on first use, so a process only pays for the providers it
+# talks to. These slots hold them once loaded.
+OpenAI = None
+Anthropic = None
+genai = None
+
+
+def _load_openai():
+    global OpenAI
+    if OpenAI is None:
+        from openai import OpenAI as _OpenAI
+        OpenAI = _OpenAI
+    return OpenAI
+
+
+def _load_anthropic():
+    global Anthropic
+    if Anthropic is None:
+        from anthropic import Anthropic as _Anthropic
+        Anthropic = _Anthropic
+    return Anthropic
+
+
+def _load_genai():
+    global genai
+    if genai is None:
+        import google.generativeai as _genai
+        genai = _genai
+    return genai
+
+
+# DeepSeek's default endpoint isn't in DEFAULT_BASE_URLS
+_FALLBACK_BASE_URLS = {**DEFAULT_BASE_URLS, "deepseek": "https://api.deepseek.com"}
+
+# (api_key env var, base_url env var, default base_url) for every provider
+_PROVIDER_DEFAULTS: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {
+    name: (config.env_var, config.base_url_var, _FALLBACK_BASE_URLS.get(name))
+    for name, config in PROVIDER_CONFIGS.items()
+}
+
+
+def _resolve(provider: str, overrides: Mapping[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Resolve (api_key, base_url): overrides first, then the environment, then the default"""
+    api_key_env, base_url_env, default_base_url = _PROVIDER_DEFAULTS[provider]
+    api_key = overrides.get("api_key") or (env(api_key_env) if api_key_env else None)
+    base_url = overrides.get("base_url") or (env(base_url_env) if base_url_env else None) or default_base_url
+    return api_key, base_url
+
+
+# Shared stand-in for overrides=None, so get_client never allocates an empty dict
+_NO_OVERRIDES: Mapping[str, Any] = MappingProxyType({})
+
+
+def _key_digest(api_key: str) -> str:
+    """Short digest of an override api_key, so client cache keys never hold the raw secret"""
+    return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+
+_NO_KEY_DIGEST = _key_digest("")
+
+
+def _build_metadata(
+    provider: str,
+    model: str,
+    supports_reasoning: bool,
+    supports_tools: bool = True,
+    supports_streaming: bool = True,
+) -> Dict[str, Any]:
+    """Client metadata returned alongside each client"""
+    return {
+        "provider": provider,
+        "model": model,
+        "supports_reasoning": supports_reasoning,
+        "supports_tools": supports_tools,
+        "supports_streaming": supports_streaming,
+    }
+
+
+def _azure_has_endpoint() -> bool:
+    """Azure needs an endpoint besides the API key"""
+    return bool(env("AZURE_BASE_URL") or env("AZURE_RESOURCE_NAME"))
+
+
+# (provider, API key env var, extra check) for providers detect_provider can pick.
+# Providers without an API key (ollama, bedrock) are never auto-detected.
+_DETECTABLE: Tuple[Tuple[str, str, Optional[Callable[[], bool]]], ...] = tuple(
+    (name, config.env_var, _azure_has_endpoint if name == "azure" else None)
+    for name, config in PROVIDER_CONFIGS.items()
+    if config.env_var
+)
+
+
 class ProviderNotConfiguredError(Exception):
     """Raised when a required provider is not properly configured"""
     pass
@@ -54,8 +150,39 @@ class AIProviderManager:
         )
     """
     
+    # Provider -> client factory method; anything else uses _get_generic_client
+    _DISPATCH: ClassVar[Dict[str, str]] = {
+        "openai": "_get_openai_client",
+        "anthropic": "_get_anthropic_client",
+        "google": "_get_google_client",
+        "azure": "_get_azure_client",
+        "ollama": "_get_ollama_client",
+        "deepseek": "_get_deepseek_client",
+        "nvidia": "_get_nvidia_client",
+    }
+    
+    # Google's "client" is the genai module, configured process-wide with one key.
+    # Caching it would hand a later caller whichever key was configured last.
+    _UNCACHED: ClassVar[frozenset] = frozenset({"google"})
+    
+    # Clients kept per manager. Every new override key or endpoint adds one, so the
+    # least recently used are dropped; the SDK clients close their pools once
+    # garbage collected, after any request still using them has finished.
+    CLIENT_CACHE_SIZE: ClassVar[int] = 32
+    
     def __init__(self):
-        self._clients: Dict[str, Any] = {}
+        # (provider, api key hash, base_url, model) -> (client, metadata)
+        self._clients: OrderedDict[Tuple[str, str, str, str], Tuple[Any, Dict[str, Any]]] = OrderedDict()
+        self._detected_provider: Any = _SENTINEL
+    
+    def reload(self) -> None:
+        """
+        Re-read environment variables after they change, dropping the detected
+        provider and every client built from the old values
+        """
+        clear_env_cache()
+        self._clients.clear()
+        self._detected_provider = _SENTINEL
     
     def detect_provider(self) -> Optional[str]:
         """
@@ -69,29 +196,45 @@ class AIProviderManager:
             >>> manager.detect_provider()
             'openai'
         """
-        configured_providers = []
+        if self._detected_provider is not _SENTINEL:
+            return self._detected_provider
         
-        for provider_name, config in PROVIDER_CONFIGS.items():
-            # Skip providers that don't need API key (ollama, bedrock)
-            if config.env_var is None:
-                continue
-            
-            # Check if API key is set
-            if os.getenv(config.env_var):
-                # Azure needs additional configuration
-                if provider_name == "azure":
-                    has_base_url = bool(os.getenv("AZURE_BASE_URL"))
-                    has_resource_name = bool(os.getenv("AZURE_RESOURCE_NAME"))
-                    if has_base_url or has_resource_name:
-                        configured_providers.append(provider_name)
-                else:
-                    configured_providers.append(provider_name)
+        configured_providers = [
+            provider_name
+            for provider_name, env_var, extra_check in _DETECTABLE
+            if env(env_var) and (extra_check is None or extra_check())
+        ]
         
         # Return provider only if exactly one is configured
-        if len(configured_providers) == 1:
-            return configured_providers[0]
+        self._detected_provider = configured_providers[0] if len(configured_providers) == 1 else None
+        return self._detected_provider
+    
+    def prewarm(self, probe: bool = False) -> Optional[str]:
+        """
+        Build and cache the client for the detected provider ahead of the first request
         
-        return None
+        Args:
+            probe: Also make a cheap models.list() call to open the connection pool
+            
+        Returns:
+            The provider that was warmed, or None if none could be detected
+            
+        Example:
+            >>> manager.prewarm()
+            'openai'
+        """
+        provider = env("ARCGEN_LLM_PROVIDER") or self.detect_provider()
+        if not provider:
+            return None
+        
+        client, _ = self.get_client(provider=provider)
+        if probe and hasattr(client, "with_options"):
+            try:
+                client.with_options(timeout=5).models.list()
+            except Exception:
+                # Warm-up is best effort; the real request will surface any error
+                pass
+        return provider
     
     def validate_provider_credentials(self, provider: str) -> None:
         """
@@ -106,7 +249,7 @@ class AIProviderManager:
         config = get_provider_config(provider)
         
         # Check API key if required
-        if config.env_var and not os.getenv(config.env_var):
+        if config.env_var and not env(config.env_var):
             raise ProviderNotConfiguredError(
                 f"{config.env_var} environment variable is required for {provider} provider. "
                 f"Please set it in your .env file."
@@ -114,8 +257,8 @@ class AIProviderManager:
         
         # Azure-specific validation
         if provider == "azure":
-            has_base_url = bool(os.getenv("AZURE_BASE_URL"))
-            has_resource_name = bool(os.getenv("AZURE_RESOURCE_NAME"))
+            has_base_url = bool(env("AZURE_BASE_URL"))
+            has_resource_name = bool(env("AZURE_RESOURCE_NAME"))
             if not (has_base_url or has_resource_name):
                 raise ProviderNotConfiguredError(
                     "Azure requires either AZURE_BASE_URL or AZURE_RESOURCE_NAME to be set."
@@ -125,7 +268,7 @@ class AIProviderManager:
         self,
         provider: Optional[str] = None,
         model: Optional[str] = None,
-        overrides: Optional[Dict[str, Any]] = None,
+        overrides: Optional[Mapping[str, Any]] = None,
     ) -> Tuple[Any, Dict[str, Any]]:
         """
         Get AI client for the specified provider
@@ -147,26 +290,22 @@ class AIProviderManager:
             >>> client, meta = manager.get_client("openai", "gpt-4")
             >>> response = client.chat.completions.create(...)
         """
-        overrides = overrides or {}
+        overrides = overrides or _NO_OVERRIDES
+        base_url = overrides.get("base_url")
+        api_key = overrides.get("api_key")
         
         # SECURITY: Validate custom endpoint before proceeding
-        if overrides.get("base_url"):
-            validate_custom_endpoint(
-                overrides.get("base_url"),
-                overrides.get("api_key"),
-                provider or "unknown"
-            )
+        if base_url:
+            validate_custom_endpoint(base_url, api_key, provider or "unknown")
             
             # Additional URL safety check
-            if not validate_url_safety(overrides["base_url"]):
-                raise SecurityError(
-                    f"Invalid or unsafe URL: {overrides['base_url']}"
-                )
+            if not validate_url_safety(base_url):
+                raise SecurityError(f"Invalid or unsafe URL: {base_url}")
         
         # Determine provider
         if not provider:
             # Try environment variable first
-            provider = os.getenv("ARCGEN_LLM_PROVIDER")
+            provider = env("ARCGEN_LLM_PROVIDER")
             
             # Try auto-detection
             if not provider:
@@ -179,112 +318,106 @@ class AIProviderManager:
                 )
         
         # Validate provider exists
-        get_provider_config(provider)  # Will raise ValueError if invalid
+        config = get_provider_config(provider)  # Will raise ValueError if invalid
         
         # Validate credentials (unless client is providing their own)
-        if not overrides.get("api_key"):
+        if not api_key:
             self.validate_provider_credentials(provider)
         
-        # Get client for specific provider
-        if provider == "openai":
-            return self._get_openai_client(model, overrides)
-        elif provider == "anthropic":
-            return self._get_anthropic_client(model, overrides)
-        elif provider == "google":
-            return self._get_google_client(model, overrides)
-        elif provider == "azure":
-            return self._get_azure_client(model, overrides)
-        elif provider == "ollama":
-            return self._get_ollama_client(model, overrides)
-        elif provider == "deepseek":
-            return self._get_deepseek_client(model, overrides)
-        elif provider == "nvidia":
-            return self._get_nvidia_client(model, overrides)
-        else:
+        if provider in self._UNCACHED:
+            return self._create_client(provider, config, model, overrides)
+        
+        # Reuse the client built for the same provider, credentials, endpoint and model
+        cache_key = (
+            provider,
+            _key_digest(api_key) if api_key else _NO_KEY_DIGEST,
+            base_url or "",
+            model or "",
+        )
+        cached = self._clients.get(cache_key)
+        if cached is not None:
+            self._clients.move_to_end(cache_key)
+            return cached
+        
+        self._clients[cache_key] = result = self._create_client(provider, config, model, overrides)
+        if len(self._clients) > self.CLIENT_CACHE_SIZE:
+            self._clients.popitem(last=False)
+        return result
+    
+    def _create_client(
+        self,
+        provider: str,
+        config: ProviderConfig,
+        model: Optional[str],
+        overrides: Mapping[str, Any],
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """Build a new client and its metadata for a validated provider"""
+        method_name = self._DISPATCH.get(provider)
+        if method_name is None:
             # Generic OpenAI-compatible client
-            return self._get_generic_client(provider, model, overrides)
+            return self._get_generic_client(provider, config, model, overrides)
+        return getattr(self, method_name)(model, overrides)
     
     def _get_openai_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get OpenAI client"""
-        api_key = overrides.get("api_key") or os.getenv("OPENAI_API_KEY")
-        base_url = overrides.get("base_url") or os.getenv("OPENAI_BASE_URL")
+        api_key, base_url = _resolve("openai", overrides)
         
-        client = OpenAI(
+        client = _load_openai()(
             api_key=api_key,
-            base_url=base_url if base_url else None,
+            base_url=base_url,
         )
         
-        metadata = {
-            "provider": "openai",
-            "model": model or "gpt-4",
-            "supports_reasoning": supports_reasoning("openai", model or ""),
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("openai", model or "gpt-4", supports_reasoning("openai", model or ""))
         
         return client, metadata
     
     def _get_anthropic_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[Anthropic, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get Anthropic client"""
-        api_key = overrides.get("api_key") or os.getenv("ANTHROPIC_API_KEY")
-        base_url = overrides.get("base_url") or os.getenv("ANTHROPIC_BASE_URL") or DEFAULT_BASE_URLS["anthropic"]
+        api_key, base_url = _resolve("anthropic", overrides)
         
-        client = Anthropic(
+        client = _load_anthropic()(
             api_key=api_key,
             base_url=base_url,
         )
         
-        metadata = {
-            "provider": "anthropic",
-            "model": model or "claude-3-5-sonnet-20241022",
-            "supports_reasoning": supports_reasoning("anthropic", model or ""),
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("anthropic", model or "claude-3-5-sonnet-20241022", supports_reasoning("anthropic", model or ""))
         
         return client, metadata
     
     def _get_google_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
+        overrides: Mapping[str, Any]
     ) -> Tuple[Any, Dict[str, Any]]:
         """Get Google Gemini client"""
-        api_key = overrides.get("api_key") or os.getenv("GOOGLE_GENERATIVE_AI_API_KEY")
+        api_key, _ = _resolve("google", overrides)
         
-        genai.configure(api_key=api_key)
+        _load_genai().configure(api_key=api_key)
         
         # Google uses a different pattern - return the module with metadata
-        metadata = {
-            "provider": "google",
-            "model": model or "gemini-2.0-flash-exp",
-            "supports_reasoning": supports_reasoning("google", model or ""),
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("google", model or "gemini-2.0-flash-exp", supports_reasoning("google", model or ""))
         
         return genai, metadata
     
     def _get_azure_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get Azure OpenAI client"""
         from openai import AzureOpenAI
         
-        api_key = overrides.get("api_key") or os.getenv("AZURE_API_KEY")
-        base_url = overrides.get("base_url") or os.getenv("AZURE_BASE_URL")
-        azure_endpoint = os.getenv("AZURE_ENDPOINT")
-        api_version = os.getenv("AZURE_API_VERSION", "2024-02-15-preview")
+        api_key, base_url = _resolve("azure", overrides)
+        azure_endpoint = env("AZURE_ENDPOINT")
+        api_version = env("AZURE_API_VERSION") or "2024-02-15-preview"
         
         client = AzureOpenAI(
             api_key=api_key,
@@ -292,117 +425,76 @@ class AIProviderManager:
             azure_endpoint=azure_endpoint or base_url,
         )
         
-        metadata = {
-            "provider": "azure",
-            "model": model or "gpt-4",
-            "supports_reasoning": True,
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("azure", model or "gpt-4", True)
         
         return client, metadata
     
     def _get_ollama_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get Ollama client (OpenAI-compatible)"""
-        base_url = overrides.get("base_url") or os.getenv("OLLAMA_BASE_URL") or DEFAULT_BASE_URLS["ollama"]
+        _, base_url = _resolve("ollama", overrides)
         
-        client = OpenAI(
+        client = _load_openai()(
             api_key="ollama",  # Ollama doesn't use API keys
             base_url=f"{base_url}/v1",
         )
         
-        metadata = {
-            "provider": "ollama",
-            "model": model or "llama2",
-            "supports_reasoning": False,
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("ollama", model or "llama2", False)
         
         return client, metadata
     
     def _get_deepseek_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get DeepSeek client (OpenAI-compatible)"""
-        api_key = overrides.get("api_key") or os.getenv("DEEPSEEK_API_KEY")
-        base_url = overrides.get("base_url") or os.getenv("DEEPSEEK_BASE_URL") or "https://api.deepseek.com"
+        api_key, base_url = _resolve("deepseek", overrides)
         
-        client = OpenAI(
+        client = _load_openai()(
             api_key=api_key,
             base_url=base_url,
         )
         
-        metadata = {
-            "provider": "deepseek",
-            "model": model or "deepseek-chat",
-            "supports_reasoning": supports_reasoning("deepseek", model or ""),
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("deepseek", model or "deepseek-chat", supports_reasoning("deepseek", model or ""))
         
         return client, metadata
     
     def _get_nvidia_client(
         self,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get NVIDIA NIM client (OpenAI-compatible)"""
-        api_key = overrides.get("api_key") or os.getenv("NVIDIA_API_KEY")
-        base_url = overrides.get("base_url") or os.getenv("NVIDIA_BASE_URL") or DEFAULT_BASE_URLS["nvidia"]
+        api_key, base_url = _resolve("nvidia", overrides)
         
-        client = OpenAI(
+        client = _load_openai()(
             api_key=api_key,
             base_url=base_url,
         )
         
-        metadata = {
-            "provider": "nvidia",
-            "model": model or "meta/llama-3.1-70b-instruct",
-            "supports_reasoning": False,
-            "supports_tools": True,
-            "supports_streaming": True,
-        }
+        metadata = _build_metadata("nvidia", model or "meta/llama-3.1-70b-instruct", False)
         
         return client, metadata
     
     def _get_generic_client(
         self,
         provider: str,
+        config: ProviderConfig,
         model: Optional[str],
-        overrides: Dict[str, Any]
-    ) -> Tuple[OpenAI, Dict[str, Any]]:
+        overrides: Mapping[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
         """Get generic OpenAI-compatible client"""
-        config = get_provider_config(provider)
-        
-        api_key = overrides.get("api_key")
-        if not api_key and config.env_var:
-            api_key = os.getenv(config.env_var)
-        
-        base_url = overrides.get("base_url")
-        if not base_url and config.base_url_var:
-            base_url = os.getenv(config.base_url_var)
-        if not base_url and provider in DEFAULT_BASE_URLS:
-            base_url = DEFAULT_BASE_URLS[provider]
+        api_key, base_url = _resolve(provider, overrides)
         
-        client = OpenAI(
+        client = _load_openai()(
             api_key=api_key or "placeholder",
             base_url=base_url,
         )
         
-        metadata = {
-            "provider": provider,
-            "model": model or "default",
-            "supports_reasoning": config.supports_reasoning,
-            "supports_tools": config.supports_tools,
-            "supports_streaming": config.supports_streaming,
-        }
+        metadata = _build_metadata(provider, model or "default", config.supports_reasoning, config.supports_tools, config.supports_streaming)
         
         return client, metadata
@@ -5,9 +5,19 @@ Implements SSRF (Server-Side Request Forgery) protection and other security meas
 Based on next-ai-draw-io security model (GHSA-9qf7-mprq-9qgm).
 """
 
+import re
+import socket
+from functools import lru_cache
+from ipaddress import ip_address
 from typing import Optional
 from urllib.parse import urlparse
 
+# Hosts allowed over plain HTTP for local development
+_LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "0.0.0.0", "::1"})
+
+_SANITIZE_RE = re.compile(r'[^a-z0-9_.-]')
+_DOT_RUN_RE = re.compile(r'\.{2,}')
+
 
 class SecurityError(Exception):
     """Raised when security validation fails"""
@@ -52,6 +62,7 @@ def validate_custom_endpoint(
         )
 
 
+@lru_cache(maxsize=1024)
 def validate_url_safety(url: str) -> bool:
     """
     Validate that a URL is safe to use.
@@ -61,6 +72,8 @@ def validate_url_safety(url: str) -> bool:
     - Uses HTTPS (except localhost)
     - Not pointing to internal/private networks
     
+    Results are cached per URL.
+    
     Args:
         url: URL to validate
         
@@ -78,31 +91,34 @@ def validate_url_safety(url: str) -> bool:
         hostname = parsed.hostname or parsed.netloc.split(":")[0]
         
         # Allow localhost HTTP for development
-        if hostname in ["localhost", "127.0.0.1", "0.0.0.0"]:
+        if hostname in _LOCAL_HOSTS:
             return True
         
         # Require HTTPS for external endpoints
         if parsed.scheme != "https":
             return False
         
-        # Block private IP ranges (basic check)
-        if hostname.startswith("10.") or hostname.startswith("192.168."):
-            return False
-        if hostname.startswith("172."):
-            # Check if in 172.16.0.0 - 172.31.255.255 range
+        # Block literal IPs in private, loopback, link-local, reserved and multicast ranges
+        try:
+            ip = ip_address(hostname)
+        except ValueError:
+            # Shorthand IPv4 forms that resolvers still accept: 2130706433, 0x7f.1, 0177.0.0.1
             try:
-                second_octet = int(hostname.split(".")[1])
-                if 16 <= second_octet <= 31:
-                    return False
-            except (IndexError, ValueError):
-                pass
-        
-        return True
+                ip = ip_address(socket.inet_aton(hostname))
+            except (OSError, ValueError):
+                return True  # Not an IP literal
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        return not (
+            ip.is_private or ip.is_loopback or ip.is_link_local
+            or ip.is_reserved or ip.is_multicast or ip.is_unspecified
+        )
         
     except Exception:
         return False
 
 
+@lru_cache(maxsize=256)
 def sanitize_library_name(library: str) -> str:
     """
     Sanitize shape library name to prevent path traversal attacks.
@@ -121,7 +137,6 @@ def sanitize_library_name(library: str) -> str:
         >>> sanitize_library_name("AWS-2.0_Beta")
         'aws-2.0_beta'
     """
-    import re
-    # Remove all characters except alphanumeric, hyphen, underscore, and dot
-    sanitized = re.sub(r'[^a-z0-9_.-]', '', library.lower())
-    return sanitized
+    # Remove all characters except alphanumeric, hyphen, underscore, and dot,
+    # then any ".." left behind so no traversal sequence survives
+    return _DOT_RUN_RE.sub('', _SANITIZE_RE.sub('', library.lower()))
@@ -14,9 +14,11 @@ Supported providers:
 """
 
 import os
-from typing import Dict, Optional
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from dataclasses import dataclass, replace
 from enum import Enum
+from ai_providers.provider_config import env, clear_env_cache
 
 
 class LLMProvider(str, Enum):
@@ -29,7 +31,8 @@ class LLMProvider(str, Enum):
     CUSTOM = "custom"
 
 
-class LLMConfig(BaseModel):
+@dataclass(slots=True, frozen=True)
+class LLMConfig:
     """Configuration for an LLM provider"""
     provider: LLMProvider
     model: str
@@ -91,34 +94,47 @@ def get_user_llm_config() -> LLMConfig:
     - ARCGEN_LLM_MODEL: Override the default model
     - ARCGEN_CUSTOM_BASE_URL: For custom providers
     """
-
-    # Get provider from environment (default to nvidia for backward compatibility)
-    provider_str = os.getenv("ARCGEN_LLM_PROVIDER", "nvidia").lower()
+    return _build_user_llm_config(
+        (env("ARCGEN_LLM_PROVIDER") or "nvidia").lower(),
+        env("ARCGEN_LLM_MODEL"),
+        env("ARCGEN_CUSTOM_BASE_URL"),
+        env("ARCGEN_LLM_TEMPERATURE"),
+    )
+
+
+@lru_cache(maxsize=8)
+def _build_user_llm_config(
+    provider_str: str,
+    model_override: Optional[str],
+    base_url_override: Optional[str],
+    temp_override: Optional[str],
+) -> LLMConfig:
+    """Build the config for one snapshot of the ARCGEN_* variables"""
     try:
         provider = LLMProvider(provider_str)
     except ValueError:
         print(f"Warning: Invalid LLM provider '{provider_str}', falling back to nvidia")
         provider = LLMProvider.NVIDIA
 
-    # Get base config
-    config = DEFAULT_CONFIGS[provider].copy()
+    update = {}
 
     # Allow model override
-    if model_override := os.getenv("ARCGEN_LLM_MODEL"):
-        config.model = model_override
+    if model_override:
+        update["model"] = model_override
 
     # Allow base URL override (useful for custom providers)
-    if base_url_override := os.getenv("ARCGEN_CUSTOM_BASE_URL"):
-        config.base_url = base_url_override
+    if base_url_override:
+        update["base_url"] = base_url_override
 
     # Allow temperature override
-    if temp_override := os.getenv("ARCGEN_LLM_TEMPERATURE"):
+    if temp_override:
         try:
-            config.temperature = float(temp_override)
+            update["temperature"] = float(temp_override)
         except ValueError:
             print(f"Warning: Invalid temperature '{temp_override}', using default")
 
-    return config
+    # DEFAULT_CONFIGS are immutable templates
+    return replace(DEFAULT_CONFIGS[provider], **update)
 
 
 def get_api_key(config: LLMConfig) -> Optional[str]:
@@ -132,27 +148,19 @@ def get_api_key(config: LLMConfig) -> Optional[str]:
     if not config.api_key_env:
         return None  # No API key needed (like Ollama)
 
-    api_key = os.getenv(config.api_key_env)
+    api_key = env(config.api_key_env)
     if not api_key:
         raise ValueError(f"API key not found. Please set {config.api_key_env} environment variable.")
 
     return api_key
 
 
-def list_available_providers() -> Dict[str, Dict]:
+def list_available_providers() -> Dict[str, Dict[str, Any]]:
     """
     Return information about all available providers for the frontend UI
     """
-    return {
-        provider.value: {
-            "name": provider.value.title(),
-            "default_model": DEFAULT_CONFIGS[provider].model,
-            "requires_api_key": bool(DEFAULT_CONFIGS[provider].api_key_env),
-            "api_key_env": DEFAULT_CONFIGS[provider].api_key_env,
-            "description": get_provider_description(provider)
-        }
-        for provider in LLMProvider
-    }
+    # Copied per call so callers can serialize or modify the result freely
+    return {name: dict(info) for name, info in _PROVIDERS_INFO.items()}
 
 
 def get_provider_description(provider: LLMProvider) -> str:
@@ -168,13 +176,26 @@ def get_provider_description(provider: LLMProvider) -> str:
     return descriptions.get(provider, "Unknown provider")
 
 
+# Provider info never changes at runtime, so it is built once
+_PROVIDERS_INFO: Dict[str, Dict[str, Any]] = {
+    provider.value: {
+        "name": provider.value.title(),
+        "default_model": DEFAULT_CONFIGS[provider].model,
+        "requires_api_key": bool(DEFAULT_CONFIGS[provider].api_key_env),
+        "api_key_env": DEFAULT_CONFIGS[provider].api_key_env,
+        "description": get_provider_description(provider)
+    }
+    for provider in LLMProvider
+}
+
+
 # Google Colab style helper functions
 def get_secret(secret_name: str) -> Optional[str]:
     """
     Google Colab style function to get secrets
     Usage: api_key = get_secret('OPENAI_API_KEY')
     """
-    return os.getenv(secret_name)
+    return env(secret_name)
 
 
 def set_secret(secret_name: str, value: str):
@@ -183,6 +204,7 @@ def set_secret(secret_name: str, value: str):
     Note: In production, this would need secure storage
     """
     os.environ[secret_name] = value
+    clear_env_cache()
     print(f"Secret '{secret_name}' has been set (this is not persistent in production)")
 
 
@@ -5,14 +5,41 @@ Inspired by next-ai-draw-io's comprehensive history management
 
 import os
 import json
+import heapq
 import uuid
+import secrets
+import zlib
+import base64
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from pydantic import BaseModel
 import hashlib
 
+try:
+    import orjson
 
-class DiagramVersion(BaseModel):
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _json_loads = json.loads
+
+try:
+    from ciso8601 import parse_datetime as _parse_timestamp
+except ImportError:
+    _parse_timestamp = datetime.fromisoformat
+
+
+# Versions kept per diagram
+MAX_VERSIONS = 50
+
+
+@dataclass(slots=True, frozen=True)
+class DiagramVersion:
     """Represents a single version of a diagram"""
     id: str
     timestamp: datetime
@@ -20,7 +47,7 @@ class DiagramVersion(BaseModel):
     xml_content: str
     provider: str
     model: str
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -37,7 +64,7 @@ class DiagramVersion(BaseModel):
     def from_dict(cls, data: Dict[str, Any]) -> 'DiagramVersion':
         return cls(
             id=data["id"],
-            timestamp=datetime.fromisoformat(data["timestamp"]),
+            timestamp=_parse_timestamp(data["timestamp"]),
             prompt=data["prompt"],
             xml_content=data["xml_content"],
             provider=data["provider"],
@@ -65,17 +92,19 @@ class DiagramHistory(BaseModel):
     def from_dict(cls, data: Dict[str, Any]) -> 'DiagramHistory':
         return cls(
             diagram_id=data["diagram_id"],
-            created_at=datetime.fromisoformat(data["created_at"]),
-            updated_at=datetime.fromisoformat(data["updated_at"]),
+            created_at=_parse_timestamp(data["created_at"]),
+            updated_at=_parse_timestamp(data["updated_at"]),
             versions=[DiagramVersion.from_dict(v) for v in data["versions"]]
         )
 
     def add_version(self, prompt: str, xml_content: str, provider: str, model: str, metadata: Dict[str, Any] = None) -> DiagramVersion:
         """Add a new version to this diagram"""
-        version_id = str(uuid.uuid4())
+        # Version ids only need to be unique within one diagram's history
+        version_id = secrets.token_hex(8)
+        now = datetime.now()
         version = DiagramVersion(
             id=version_id,
-            timestamp=datetime.now(),
+            timestamp=now,
             prompt=prompt,
             xml_content=xml_content,
             provider=provider,
@@ -84,11 +113,12 @@ class DiagramHistory(BaseModel):
         )
 
         self.versions.append(version)
-        self.updated_at = datetime.now()
+        self.updated_at = now
 
-        # Keep only the last 50 versions to prevent unlimited growth
-        if len(self.versions) > 50:
-            self.versions = self.versions[-50:]
+        # Keep only the last MAX_VERSIONS versions to prevent unlimited growth;
+        # trimmed in place rather than rebuilding and reassigning the list
+        if len(self.versions) > MAX_VERSIONS:
+            del self.versions[:-MAX_VERSIONS]
 
         return version
 
@@ -101,12 +131,87 @@ class DiagramHistory(BaseModel):
         return self.versions[-1] if self.versions else None
 
 
+def _delta_encode(xml: bytes, previous: bytes) -> str:
+    """Compress a version's XML with the previous version as zlib preset dictionary"""
+    compressor = zlib.compressobj(zdict=previous) if previous else zlib.compressobj()
+    return base64.b64encode(compressor.compress(xml) + compressor.flush()).decode("ascii")
+
+
+def _delta_decode(encoded: str, previous: bytes) -> bytes:
+    """Inverse of _delta_encode"""
+    decompressor = zlib.decompressobj(zdict=previous) if previous else zlib.decompressobj()
+    return decompressor.decompress(base64.b64decode(encoded)) + decompressor.flush()
+
+
+def _parse_versions(lines: List[bytes]) -> List[DiagramVersion]:
+    """Decode NDJSON version lines, rebuilding delta-compressed XML from the version before it"""
+    versions = []
+    previous = b""
+    for line in lines:
+        record = _json_loads(line)
+        if "xml_delta" in record:
+            previous = _delta_decode(record.pop("xml_delta"), previous)
+            record["xml_content"] = previous.decode("utf-8")
+        else:
+            previous = record["xml_content"].encode("utf-8")
+        versions.append(DiagramVersion.from_dict(record))
+    return versions
+
+
+def _ndjson_header(data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    The header of an NDJSON history file, or None for the older single-document
+    layout: one JSON document, indented over many lines or holding "versions"
+    """
+    try:
+        header = _json_loads(data.partition(b"\n")[0])
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or "versions" in header:
+        return None
+    return header
+
+
+def _parse_history(data: bytes) -> DiagramHistory:
+    """Parse a saved history file, in either the NDJSON or the older single-document layout"""
+    header = _ndjson_header(data)
+    if header is None:
+        return DiagramHistory.from_dict(_json_loads(data))
+
+    rest = data.partition(b"\n")[2]
+    return DiagramHistory(
+        diagram_id=header["diagram_id"],
+        created_at=_parse_timestamp(header["created_at"]),
+        updated_at=_parse_timestamp(header["updated_at"]),
+        versions=_parse_versions([line for line in rest.splitlines() if line])
+    )
+
+
+def _listing_row(diagram_id: str, created_at: str, updated_at: str, version_count: int,
+                 prompt: str, provider: str, model: str) -> Dict[str, Any]:
+    """One list_diagrams row; long prompts are cut to 100 characters"""
+    return {
+        "diagram_id": diagram_id,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "version_count": version_count,
+        "latest_prompt": f"{prompt[:100]}..." if len(prompt) > 100 else prompt,
+        "latest_provider": provider,
+        "latest_model": model
+    }
+
+
 class DiagramHistoryManager:
     """Manages diagram history storage and retrieval"""
 
+    # Parsed histories kept in memory, least recently used evicted first
+    CACHE_SIZE = 128
+
     def __init__(self, storage_dir: str = "diagram_history"):
         self.storage_dir = storage_dir
         os.makedirs(storage_dir, exist_ok=True)
+        # diagram_id -> ((mtime_ns, size) of the file it was parsed from, history)
+        self._cache: OrderedDict[str, Tuple[Tuple[int, int], DiagramHistory]] = OrderedDict()
 
     def _get_diagram_path(self, diagram_id: str) -> str:
         """Get the file path for a diagram"""
@@ -116,10 +221,11 @@ class DiagramHistoryManager:
         """Create a new diagram with initial version"""
         diagram_id = str(uuid.uuid4())
 
+        now = datetime.now()
         history = DiagramHistory(
             diagram_id=diagram_id,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=now,
+            updated_at=now
         )
 
         # Add initial version
@@ -151,56 +257,159 @@ class DiagramHistoryManager:
             return None
         return history.get_version(version_id)
 
-    def list_diagrams(self) -> List[Dict[str, Any]]:
-        """List all saved diagrams with metadata"""
+    def list_diagrams(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """List saved diagrams with metadata, most recently updated first (all of them unless limit is set)"""
         diagrams = []
 
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.json'):
-                diagram_id = filename[:-5]  # Remove .json extension
-                history = self._load_diagram(diagram_id)
-                if history:
-                    latest_version = history.get_latest_version()
-                    diagrams.append({
-                        "diagram_id": diagram_id,
-                        "created_at": history.created_at.isoformat(),
-                        "updated_at": history.updated_at.isoformat(),
-                        "version_count": len(history.versions),
-                        "latest_prompt": latest_version.prompt[:100] + "..." if latest_version and len(latest_version.prompt) > 100 else (latest_version.prompt if latest_version else ""),
-                        "latest_provider": latest_version.provider if latest_version else "",
-                        "latest_model": latest_version.model if latest_version else ""
-                    })
+        with os.scandir(self.storage_dir) as entries:
+            for dir_entry in entries:
+                if dir_entry.name.endswith('.json') and dir_entry.is_file():
+                    # Remove .json extension
+                    entry = self._list_entry(dir_entry.name[:-5], dir_entry.stat())
+                    if entry:
+                        diagrams.append(entry)
 
         # Sort by updated_at descending
+        if limit is not None:
+            return heapq.nlargest(limit, diagrams, key=lambda x: x["updated_at"])
         diagrams.sort(key=lambda x: x["updated_at"], reverse=True)
         return diagrams
 
+    def _list_entry(self, diagram_id: str, st: os.stat_result) -> Optional[Dict[str, Any]]:
+        """
+        Summarize one diagram for list_diagrams. An NDJSON file only needs its
+        header and last line decoded; older files and cached histories go
+        through the full history
+        """
+        diagram_path = self._get_diagram_path(diagram_id)
+        try:
+            history = self._cached(diagram_id, st)
+            if history is None:
+                with open(diagram_path, 'rb') as f:
+                    data = f.read()
+                header = _ndjson_header(data)
+                if header is None:
+                    history = self._load_diagram(diagram_id)
+                    if history is None:
+                        return None
+            if history is not None:
+                latest = history.get_latest_version()
+                return _listing_row(
+                    diagram_id,
+                    history.created_at.isoformat(),
+                    history.updated_at.isoformat(),
+                    len(history.versions),
+                    latest.prompt if latest else "",
+                    latest.provider if latest else "",
+                    latest.model if latest else "",
+                )
+
+            last_line = data.rfind(b"\n")
+            latest = {} if last_line == -1 else _json_loads(data[last_line + 1:])
+            return _listing_row(
+                diagram_id,
+                header["created_at"],
+                header["updated_at"],
+                data.count(b"\n"),
+                latest.get("prompt", ""),
+                latest.get("provider", ""),
+                latest.get("model", ""),
+            )
+        except (OSError, ValueError, KeyError):
+            # Unreadable or corrupt file
+            return None
+
     def delete_diagram(self, diagram_id: str) -> bool:
         """Delete a diagram and all its versions"""
         diagram_path = self._get_diagram_path(diagram_id)
+        self._cache.pop(diagram_id, None)
         if os.path.exists(diagram_path):
             os.remove(diagram_path)
             return True
         return False
 
     def _save_diagram(self, history: DiagramHistory) -> None:
-        """Save diagram history to disk"""
+        """
+        Save diagram history to disk as NDJSON: a header line with the diagram
+        fields, then one line per version, so versions are encoded one at a time.
+        Successive versions share most of their XML, so each version's XML is
+        stored compressed against the version before it
+        """
         diagram_path = self._get_diagram_path(history.diagram_id)
-        with open(diagram_path, 'w', encoding='utf-8') as f:
-            json.dump(history.to_dict(), f, indent=2, ensure_ascii=False)
+        self._cache.pop(history.diagram_id, None)
+        header = {
+            "diagram_id": history.diagram_id,
+            "created_at": history.created_at.isoformat(),
+            "updated_at": history.updated_at.isoformat(),
+        }
+        # Write to a temp file and swap it in, so readers never see a half-written file
+        tmp_path = f"{diagram_path}.tmp"
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(_json_dumps(header))
+            previous = b""
+            for version in history.versions:
+                record = version.to_dict()
+                xml = record.pop("xml_content").encode("utf-8")
+                record["xml_delta"] = _delta_encode(xml, previous)
+                previous = xml
+                f.write(b"\n")
+                f.write(_json_dumps(record))
+        os.replace(tmp_path, diagram_path)
+        self._remember(history.diagram_id, os.stat(diagram_path), history)
 
     def _load_diagram(self, diagram_id: str) -> Optional[DiagramHistory]:
-        """Load diagram history from disk"""
+        """Load diagram history from disk, reusing the cached parse while the file is unchanged"""
         diagram_path = self._get_diagram_path(diagram_id)
-        if not os.path.exists(diagram_path):
+        try:
+            st = os.stat(diagram_path)
+        except OSError:
+            self._cache.pop(diagram_id, None)
             return None
 
+        cached = self._cached(diagram_id, st)
+        if cached is not None:
+            return cached
+
         try:
-            with open(diagram_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return DiagramHistory.from_dict(data)
-        except Exception:
+            with open(diagram_path, 'rb') as f:
+                data = f.read()
+            history = _parse_history(data)
+        except (OSError, ValueError, KeyError):
+            return None
+        self._remember(diagram_id, st, history)
+        return history
+
+    def _cached(self, diagram_id: str, st: os.stat_result) -> Optional[DiagramHistory]:
+        """Return the cached history if it was parsed from the file as it is now"""
+        hit = self._cache.get(diagram_id)
+        if hit is None or hit[0] != (st.st_mtime_ns, st.st_size):
             return None
+        self._cache.move_to_end(diagram_id)
+        return hit[1]
+
+    def _remember(self, diagram_id: str, st: os.stat_result, history: DiagramHistory) -> None:
+        """Cache a parsed history against the stat of the file it matches"""
+        self._cache[diagram_id] = ((st.st_mtime_ns, st.st_size), history)
+        self._cache.move_to_end(diagram_id)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _count_versions(self, diagram_id: str, st: os.stat_result) -> int:
+        """Count a diagram's versions without parsing them; NDJSON files hold one line per version"""
+        diagram_path = self._get_diagram_path(diagram_id)
+        try:
+            cached = self._cached(diagram_id, st)
+            if cached is not None:
+                return len(cached.versions)
+            with open(diagram_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return 0
+        if _ndjson_header(data) is None:
+            # Older single-document layout: the line count says nothing, parse it
+            history = self._load_diagram(diagram_id)
+            return len(history.versions) if history else 0
+        return data.count(b"\n")
 
     def get_stats(self) -> Dict[str, Any]:
         """Get storage statistics"""
@@ -208,16 +417,15 @@ class DiagramHistoryManager:
         total_versions = 0
         total_size = 0
 
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.json'):
-                total_diagrams += 1
-                filepath = os.path.join(self.storage_dir, filename)
-                total_size += os.path.getsize(filepath)
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    total_diagrams += 1
+                    st = entry.stat()
+                    total_size += st.st_size
 
-                # Count versions in this diagram
-                history = self._load_diagram(filename[:-5])
-                if history:
-                    total_versions += len(history.versions)
+                    # Count versions in this diagram
+                    total_versions += self._count_versions(entry.name[:-5], st)
 
         return {
             "total_diagrams": total_diagrams,
@@ -5,15 +5,94 @@ Inspired by next-ai-draw-io's comprehensive file handling
 """
 
 import os
-import tempfile
 import base64
-from typing import Dict, Any, Optional, Tuple
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Any, List, Optional, Tuple
 import fitz  # PyMuPDF for PDF processing
 from PIL import Image
 import io
 
 
+# Leading bytes of each supported format (WebP is checked separately: RIFF....WEBP)
+_MAGIC_SIGNATURES = (
+    (b'%PDF', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+_EXTENSION_TYPES = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# PDFs with at least this many pages have their text extracted across worker processes
+PARALLEL_PDF_PAGES = 64
+# PyMuPDF isn't thread-safe and holds the GIL, so shards run in processes
+_PDF_WORKERS = min(4, os.cpu_count() or 1)
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _read_pages(doc: fitz.Document, start: int, stop: int) -> Tuple[List[str], bool]:
+    """Text of pages [start, stop) and whether any of them contains images"""
+    text_content = []
+    has_images = False
+    for page_num in range(start, stop):
+        page = doc.load_page(page_num)
+        text_content.append(f"Page {page_num + 1}:\n{page.get_text()}")
+        if not has_images and page.get_images(full=False):
+            has_images = True
+    return text_content, has_images
+
+
+def _read_page_range(file_content: bytes, start: int, stop: int) -> Tuple[List[str], bool]:
+    """Worker-process entry point: open the PDF and read one shard of its pages"""
+    with fitz.open(stream=file_content, filetype="pdf") as doc:
+        return _read_pages(doc, start, stop)
+
+
+def _read_pages_parallel(file_content: bytes, page_count: int) -> Tuple[List[str], bool]:
+    """Split the page range into one contiguous shard per worker and merge the results in order"""
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=_PDF_WORKERS)
+
+    step = -(-page_count // _PDF_WORKERS)
+    starts = range(0, page_count, step)
+    futures = [_pdf_pool.submit(_read_page_range, file_content, start, min(start + step, page_count)) for start in starts]
+
+    text_content = []
+    has_images = False
+    for future in futures:
+        texts, shard_has_images = future.result()
+        text_content.extend(texts)
+        has_images = has_images or shard_has_images
+    return text_content, has_images
+
+
+def shutdown_pdf_pool() -> None:
+    """Stop the PDF worker processes, if any were started"""
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown()
+        _pdf_pool = None
+
+
+# PIL format for each image content type, so Image.open skips sniffing the others
+_PIL_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/gif': 'GIF',
+    'image/webp': 'WEBP',
+}
+
+
 class FileProcessor:
     """Processes uploaded files for diagram generation"""
 
@@ -22,10 +101,12 @@ class FileProcessor:
     SUPPORTED_DOCUMENT_TYPES = {'application/pdf'}
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-    def __init__(self):
-        # Create temp directory for file processing
-        self.temp_dir = Path(tempfile.gettempdir()) / "arcgen_files"
-        self.temp_dir.mkdir(exist_ok=True)
+    # Terms that hint at what a PDF describes, matched as substrings
+    TECHNICAL_KEYWORDS = (
+        'system', 'architecture', 'database', 'server', 'api', 'user', 'client',
+        'service', 'component', 'module', 'interface', 'data', 'flow', 'process',
+        'network', 'cloud', 'aws', 'azure', 'gcp', 'docker', 'kubernetes'
+    )
 
     def process_file(self, file_content: bytes, filename: str) -> Dict[str, Any]:
         """
@@ -43,29 +124,22 @@ class FileProcessor:
             raise ValueError(f"File too large: {file_size} bytes (max {self.MAX_FILE_SIZE})")
 
         # Determine file type
-        file_extension = Path(filename).suffix.lower()
         content_type = self._guess_content_type(file_content, filename)
 
         # Process based on file type
         if content_type in self.SUPPORTED_DOCUMENT_TYPES:
             return self._process_pdf(file_content, filename)
         elif content_type in self.SUPPORTED_IMAGE_TYPES:
-            return self._process_image(file_content, filename)
+            return self._process_image(file_content, filename, content_type)
         else:
             raise ValueError(f"Unsupported file type: {content_type}")
 
     def _process_pdf(self, file_content: bytes, filename: str) -> Dict[str, Any]:
         """Extract text and metadata from PDF files"""
         try:
-            # Save to temp file for processing
-            temp_path = self.temp_dir / f"temp_{hash(filename)}.pdf"
-            temp_path.write_bytes(file_content)
+            # Open with PyMuPDF straight from memory
+            doc = fitz.open(stream=file_content, filetype="pdf")
 
-            # Open with PyMuPDF
-            doc = fitz.open(str(temp_path))
-
-            # Extract text from all pages
-            text_content = []
             metadata = {
                 "page_count": len(doc),
                 "title": doc.metadata.get("title", ""),
@@ -76,14 +150,14 @@ class FileProcessor:
                 "file_size": len(file_content)
             }
 
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                text_content.append(f"Page {page_num + 1}:\n{text}")
-
-            # Clean up
-            doc.close()
-            temp_path.unlink(missing_ok=True)
+            # Extract text from all pages, noting images on the same pass
+            page_count = len(doc)
+            if page_count >= PARALLEL_PDF_PAGES and _PDF_WORKERS > 1:
+                doc.close()
+                text_content, has_images = _read_pages_parallel(file_content, page_count)
+            else:
+                text_content, has_images = _read_pages(doc, 0, page_count)
+                doc.close()
 
             full_text = "\n\n".join(text_content)
 
@@ -91,33 +165,36 @@ class FileProcessor:
                 "content_type": "pdf",
                 "filename": filename,
                 "metadata": metadata,
-                "summary": self._summarize_pdf_content(full_text, metadata),
+                "summary": self._summarize_pdf_content(text_content, metadata),
                 "extracted_text": full_text,
                 "text_length": len(full_text),
-                "has_images": self._pdf_has_images(file_content)
+                "has_images": has_images
             }
 
         except Exception as e:
             raise ValueError(f"Failed to process PDF: {str(e)}")
 
-    def _process_image(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    def _process_image(self, file_content: bytes, filename: str, content_type: Optional[str] = None) -> Dict[str, Any]:
         """Analyze image files for diagram generation"""
         try:
-            # Open image with PIL
-            image = Image.open(io.BytesIO(file_content))
+            # Image.open only reads the header; pixels are never decoded here
+            pil_format = _PIL_FORMATS.get(content_type)
+            image = Image.open(io.BytesIO(file_content), formats=[pil_format] if pil_format else None)
+            width, height = image.size
+            image_format, mode = image.format, image.mode
 
             # Basic image analysis
             metadata = {
-                "width": image.width,
-                "height": image.height,
-                "format": image.format,
-                "mode": image.mode,
+                "width": width,
+                "height": height,
+                "format": image_format,
+                "mode": mode,
                 "file_size": len(file_content),
-                "has_alpha": image.mode in ('RGBA', 'LA', 'P')
+                "has_alpha": mode in ('RGBA', 'LA', 'P')
             }
 
             # Convert to base64 for AI processing
-            base64_image = base64.b64encode(file_content).decode('utf-8')
+            base64_image = base64.b64encode(file_content).decode('ascii')
 
             # Generate image description prompt for AI
             image_analysis = self._analyze_image_for_diagrams(metadata)
@@ -128,8 +205,7 @@ class FileProcessor:
                 "metadata": metadata,
                 "summary": image_analysis["description"],
                 "base64_data": base64_image,
-                "image_analysis": image_analysis,
-                "data_url": f"data:image/{image.format.lower()};base64,{base64_image}"
+                "image_analysis": image_analysis
             }
 
         except Exception as e:
@@ -193,26 +269,17 @@ Generate a professional diagram based on this image analysis."""
 
         return prompt
 
-    def _summarize_pdf_content(self, full_text: str, metadata: Dict[str, Any]) -> str:
+    def _summarize_pdf_content(self, pages: List[str], metadata: Dict[str, Any]) -> str:
         """Create a summary of PDF content for diagram generation"""
-        # Simple text analysis - in a real implementation, you'd use NLP
-        lines = full_text.split('\n')
-        non_empty_lines = [line.strip() for line in lines if line.strip()]
-
-        # Look for common technical terms
-        technical_terms = []
-        keywords = [
-            'system', 'architecture', 'database', 'server', 'api', 'user', 'client',
-            'service', 'component', 'module', 'interface', 'data', 'flow', 'process',
-            'network', 'cloud', 'aws', 'azure', 'gcp', 'docker', 'kubernetes'
-        ]
-
-        found_keywords = set()
-        for line in non_empty_lines[:50]:  # Check first 50 lines
-            line_lower = line.lower()
-            for keyword in keywords:
-                if keyword in line_lower:
-                    found_keywords.add(keyword)
+        # Simple text analysis - in a real implementation, you'd use NLP.
+        # Only the first 50 non-empty lines are used, so stop reading pages there
+        lines = (line.strip() for line in chain.from_iterable(page.split('\n') for page in pages))
+        non_empty_lines = list(islice(filter(None, lines), 50))
+
+        # Look for common technical terms in the first 50 lines, searched as one
+        # lowercased block; the newline separators keep matches within a line
+        head = '\n'.join(non_empty_lines[:50]).lower()
+        found_keywords = {keyword for keyword in self.TECHNICAL_KEYWORDS if keyword in head}
 
         # Create summary
         summary_parts = []
@@ -257,55 +324,18 @@ Generate a professional diagram based on this image analysis."""
 
         return analysis
 
-    def _pdf_has_images(self, file_content: bytes) -> bool:
-        """Check if PDF contains images"""
-        try:
-            temp_path = self.temp_dir / "temp_check.pdf"
-            temp_path.write_bytes(file_content)
-
-            doc = fitz.open(str(temp_path))
-            has_images = False
-
-            for page in doc:
-                if page.get_images():
-                    has_images = True
-                    break
-
-            doc.close()
-            temp_path.unlink(missing_ok=True)
-            return has_images
-
-        except:
-            return False
-
     def _guess_content_type(self, file_content: bytes, filename: str) -> str:
         """Guess content type from file content and filename"""
         # Check file signature (magic bytes)
-        if file_content.startswith(b'%PDF'):
-            return 'application/pdf'
-        elif file_content.startswith(b'\xff\xd8\xff'):
-            return 'image/jpeg'
-        elif file_content.startswith(b'\x89PNG\r\n\x1a\n'):
-            return 'image/png'
-        elif file_content.startswith(b'GIF87a') or file_content.startswith(b'GIF89a'):
-            return 'image/gif'
-        elif file_content.startswith(b'RIFF') and file_content[8:12] == b'WEBP':
+        for signature, content_type in _MAGIC_SIGNATURES:
+            if file_content.startswith(signature):
+                return content_type
+        if file_content.startswith(b'RIFF') and file_content[8:12] == b'WEBP':
             return 'image/webp'
 
         # Fallback to extension
-        ext = Path(filename).suffix.lower()
-        if ext == '.pdf':
-            return 'application/pdf'
-        elif ext in ['.jpg', '.jpeg']:
-            return 'image/jpeg'
-        elif ext == '.png':
-            return 'image/png'
-        elif ext == '.gif':
-            return 'image/gif'
-        elif ext == '.webp':
-            return 'image/webp'
-
-        return 'application/octet-stream'
+        ext = os.path.splitext(filename)[1].lower()
+        return _EXTENSION_TYPES.get(ext, 'application/octet-stream')
 
 
 # Global instance
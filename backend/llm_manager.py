@@ -17,6 +17,27 @@ class LLMManager:
     def __init__(self, config: LLMConfig):
         self.config = config
         self.api_key = get_api_key(config)
+        # One pooled client per manager so repeated calls reuse warm TLS connections
+        self._http = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+        self._openai_client = None
+
+    async def aclose(self):
+        """Close the shared HTTP connection pool"""
+        await self._http.aclose()
+
+    def _openai(self):
+        """OpenAI-compatible client for this manager, built on first use"""
+        if self._openai_client is None:
+            from openai import AsyncOpenAI
+            self._openai_client = AsyncOpenAI(
+                base_url=self.config.base_url,
+                api_key=self.api_key,
+                http_client=self._http,
+            )
+        return self._openai_client
 
     async def generate_csv(self, prompt: str) -> str:
         """
@@ -78,10 +99,9 @@ Generate the CSV diagram:"""
     async def _call_openai(self, prompt: str) -> str:
         """Call OpenAI API"""
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=self.api_key, base_url=self.config.base_url)
+            client = self._openai()
 
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.config.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.config.temperature,
@@ -95,61 +115,55 @@ Generate the CSV diagram:"""
     async def _call_anthropic(self, prompt: str) -> str:
         """Call Anthropic API"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.config.base_url}/v1/messages",
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.config.model,
-                        "max_tokens": self.config.max_tokens,
-                        "temperature": self.config.temperature,
-                        "messages": [{"role": "user", "content": prompt}]
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["content"][0]["text"]
+            response = await self._http.post(
+                f"{self.config.base_url}/v1/messages",
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "content-type": "application/json"
+                },
+                json={
+                    "model": self.config.model,
+                    "max_tokens": self.config.max_tokens,
+                    "temperature": self.config.temperature,
+                    "messages": [{"role": "user", "content": prompt}]
+                },
+                timeout=60.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["content"][0]["text"]
         except Exception as e:
             raise Exception(f"Anthropic API error: {str(e)}")
 
     async def _call_google(self, prompt: str) -> str:
         """Call Google Gemini API"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.config.base_url}/v1beta/models/{self.config.model}:generateContent",
-                    params={"key": self.api_key},
-                    json={
-                        "contents": [{"parts": [{"text": prompt}]}],
-                        "generationConfig": {
-                            "temperature": self.config.temperature,
-                            "maxOutputTokens": self.config.max_tokens,
-                            "topP": self.config.top_p
-                        }
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["candidates"][0]["content"]["parts"][0]["text"]
+            response = await self._http.post(
+                f"{self.config.base_url}/v1beta/models/{self.config.model}:generateContent",
+                params={"key": self.api_key},
+                json={
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {
+                        "temperature": self.config.temperature,
+                        "maxOutputTokens": self.config.max_tokens,
+                        "topP": self.config.top_p
+                    }
+                },
+                timeout=60.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["candidates"][0]["content"]["parts"][0]["text"]
         except Exception as e:
             raise Exception(f"Google API error: {str(e)}")
 
     async def _call_nvidia(self, prompt: str) -> str:
         """Call NVIDIA NIM API (current implementation)"""
         try:
-            from openai import OpenAI
-            client = OpenAI(
-                base_url=self.config.base_url,
-                api_key=self.api_key
-            )
+            client = self._openai()
 
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.config.model,
                 messages=[
                     {"role": "system", "content": "You are a system architecture expert that creates draw.io CSV diagrams."},
@@ -166,37 +180,32 @@ Generate the CSV diagram:"""
     async def _call_ollama(self, prompt: str) -> str:
         """Call local Ollama API"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.config.base_url}/chat/completions",
-                    json={
-                        "model": self.config.model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "stream": False,
-                        "options": {
-                            "temperature": self.config.temperature,
-                            "num_predict": self.config.max_tokens,
-                            "top_p": self.config.top_p
-                        }
-                    },
-                    timeout=120.0  # Ollama can be slower
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            response = await self._http.post(
+                f"{self.config.base_url}/chat/completions",
+                json={
+                    "model": self.config.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "stream": False,
+                    "options": {
+                        "temperature": self.config.temperature,
+                        "num_predict": self.config.max_tokens,
+                        "top_p": self.config.top_p
+                    }
+                },
+                timeout=120.0  # Ollama can be slower
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
         except Exception as e:
             raise Exception(f"Ollama API error: {str(e)}. Make sure Ollama is running locally.")
 
     async def _call_custom(self, prompt: str) -> str:
         """Call custom OpenAI-compatible API"""
         try:
-            from openai import OpenAI
-            client = OpenAI(
-                base_url=self.config.base_url,
-                api_key=self.api_key
-            )
+            client = self._openai()
 
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.config.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.config.temperature,
@@ -221,7 +230,10 @@ async def test_llm_provider(config: LLMConfig) -> Dict[str, Any]:
         manager = create_llm_manager(config)
         # Simple test prompt
         test_prompt = "Generate a simple CSV diagram with just one component: a user."
-        csv_result = await manager.generate_csv(test_prompt)
+        try:
+            csv_result = await manager.generate_csv(test_prompt)
+        finally:
+            await manager.aclose()
 
         return {
             "success": True,
@@ -10,7 +10,7 @@ from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from ai_providers import get_ai_provider_manager, ClientOverrides, Provider
 from diagram_history import get_history_manager
-from file_processor import get_file_processor
+from file_processor import get_file_processor, shutdown_pdf_pool
 from datetime import datetime
 from typing import List, Dict
 from fastapi import UploadFile, File
@@ -32,6 +32,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+def stop_pdf_workers():
+    """Stop the PDF text extraction worker processes"""
+    shutdown_pdf_pool()
+
+
 def validate_csv_format(csv_content: str) -> bool:
     """
     Validate that the CSV content has the proper draw.io format
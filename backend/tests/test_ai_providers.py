@@ -5,6 +5,7 @@ Tests provider manager, security features, and auto-detection.
 """
 
 import os
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -16,6 +17,8 @@ from backend.ai_providers.security import (
     SecurityError,
 )
 from backend.ai_providers.provider_config import (
+    clear_env_cache,
+    env,
     get_provider_config,
     supports_reasoning,
     PROVIDER_CONFIGS,
@@ -67,6 +70,42 @@ class TestSecurity:
         assert not validate_url_safety("https://192.168.1.1")
         assert not validate_url_safety("https://172.16.0.1")
     
+    @pytest.mark.parametrize("url", [
+        "https://127.0.0.2",
+        "https://10.1.2.3",
+        "https://169.254.1.1",
+        "https://169.254.169.254/latest/meta-data",
+        "http://169.254.169.254",
+        "https://0.0.0.1",
+        "https://224.0.0.1",
+        "https://[fe80::1]",
+        "https://[fd00::1]",
+        "https://[::ffff:127.0.0.1]",
+        "https://[::ffff:169.254.169.254]",
+        "https://2130706433",
+        "https://0x7f000001",
+        "https://0177.0.0.1",
+        "https://127.1",
+        "https://2852039166",
+        "https://0xA9.0xFE.0xA9.0xFE",
+    ])
+    def test_url_safety_blocks_internal_addresses(self, url):
+        """Should block loopback, private, link-local and metadata addresses in every IP notation"""
+        assert not validate_url_safety(url)
+    
+    @pytest.mark.parametrize("url", [
+        "http://[::1]:11434",
+        "https://8.8.8.8",
+        "https://[2001:4860:4860::8888]",
+        "https://10.0.0.1.example.com",
+        "https://127.0.0.1.nip.io",
+        "https://1e100.net",
+        "https://api.0x7f.dev",
+    ])
+    def test_url_safety_allows_public_and_ip_like_hostnames(self, url):
+        """Should allow public IPs, local development on ::1, and hostnames that only look like IPs"""
+        assert validate_url_safety(url)
+    
     def test_library_name_sanitization(self):
         """Should sanitize library names to prevent path traversal"""
         assert sanitize_library_name("aws4") == "aws4"
@@ -134,6 +173,7 @@ class TestProviderManager:
         original = {}
         for var in env_vars:
             original[var] = os.environ.pop(var, None)
+        clear_env_cache()
         
         yield
         
@@ -141,6 +181,7 @@ class TestProviderManager:
         for var, value in original.items():
             if value is not None:
                 os.environ[var] = value
+        clear_env_cache()
     
     def test_auto_detection_single_provider(self, manager, clean_env):
         """Should auto-detect when exactly one provider is configured"""
@@ -175,6 +216,74 @@ class TestProviderManager:
             assert metadata["model"] == "gpt-4"
             assert metadata["supports_tools"] is True
     
+    def test_metadata_is_plain_dict(self, manager, clean_env):
+        """Metadata should serialize to JSON and accept extra keys"""
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+        
+        with patch('backend.ai_providers.provider_manager.OpenAI'):
+            _, metadata = manager.get_client(provider="openai", model="o1-preview")
+        
+        assert json.loads(json.dumps(metadata))["supports_reasoning"] is True
+        metadata["request_id"] = "abc"
+    
+    def test_prewarm_caches_detected_client(self, manager, clean_env):
+        """Should build the detected provider's client once, before any request"""
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+        
+        with patch('backend.ai_providers.provider_manager.OpenAI') as mock_openai:
+            mock_openai.return_value = MagicMock()
+            
+            assert manager.prewarm() == "openai"
+            manager.get_client(provider="openai")
+            
+            mock_openai.assert_called_once()
+    
+    def test_google_client_follows_each_callers_key(self, manager, clean_env):
+        """The shared genai module must be configured with the current caller's key"""
+        with patch('backend.ai_providers.provider_manager.genai') as mock_genai:
+            for key in ("key-a", "key-b", "key-a"):
+                client, _ = manager.get_client(provider="google", overrides={"api_key": key})
+                
+                assert client is mock_genai
+                mock_genai.configure.assert_called_with(api_key=key)
+            
+            assert mock_genai.configure.call_count == 3
+    
+    def test_client_cache_is_bounded(self, manager, clean_env):
+        """Override keys must not pile up clients; the least recently used is dropped"""
+        manager.CLIENT_CACHE_SIZE = 2
+        
+        with patch('backend.ai_providers.provider_manager.OpenAI') as mock_openai:
+            mock_openai.side_effect = lambda **kwargs: MagicMock()
+            
+            first, _ = manager.get_client(provider="openai", overrides={"api_key": "key-1"})
+            manager.get_client(provider="openai", overrides={"api_key": "key-2"})
+            assert manager.get_client(provider="openai", overrides={"api_key": "key-1"})[0] is first
+            manager.get_client(provider="openai", overrides={"api_key": "key-3"})
+            
+            assert len(manager._clients) == 2
+            assert manager.get_client(provider="openai", overrides={"api_key": "key-1"})[0] is first
+            assert mock_openai.call_count == 3
+            
+            manager.get_client(provider="openai", overrides={"api_key": "key-2"})
+            assert mock_openai.call_count == 4
+    
+    def test_new_manager_keeps_env_cache(self, manager, clean_env):
+        """Creating a manager must not wipe the process-wide env cache; reload() re-reads it"""
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+        assert manager.detect_provider() == "openai"
+        
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-test"
+        assert env("ANTHROPIC_API_KEY") is None
+        assert AIProviderManager().detect_provider() == "openai"
+        
+        manager.reload()
+        assert manager.detect_provider() is None
+    
+    def test_prewarm_without_provider(self, manager, clean_env):
+        """Should do nothing when no provider is configured"""
+        assert manager.prewarm() is None
+    
     def test_get_client_ssrf_protection(self, manager, clean_env):
         """Should enforce SSRF protection"""
         with pytest.raises(SecurityError):
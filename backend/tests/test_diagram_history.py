@@ -0,0 +1,186 @@
+"""
+Test suite for diagram history storage
+
+Tests the NDJSON file layout, the older single-document layout and atomic saves.
+"""
+
+import os
+import json
+import hashlib
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from backend.diagram_history import (
+    DiagramHistory,
+    DiagramHistoryManager,
+    MAX_VERSIONS,
+    _delta_encode,
+)
+
+
+def _xml(n: int) -> str:
+    return f'<mxfile><diagram id="d"><mxCell id="{n}" value="Service {n}"/></diagram></mxfile>'
+
+
+def _large_xml(n: int, cells: int = 2000) -> str:
+    """Well over zlib's 32 KiB dictionary window, with version n changing the last cell"""
+    body = "".join(
+        f'<mxCell id="{i}" value="{hashlib.sha256(str(i).encode()).hexdigest()}"/>'
+        for i in range(cells)
+    )
+    return f'<mxfile><diagram id="d">{body}<mxCell id="last" value="{n}"/></diagram></mxfile>'
+
+
+class TestHistoryStorage:
+    """Test saving and loading history files"""
+    
+    @pytest.fixture
+    def storage_dir(self, tmp_path):
+        return str(tmp_path)
+    
+    @pytest.fixture
+    def manager(self, storage_dir):
+        return DiagramHistoryManager(storage_dir)
+    
+    def test_save_load_round_trip(self, manager, storage_dir):
+        """A fresh manager should read back exactly what was saved"""
+        diagram_id = manager.create_diagram("a web app", _xml(1), "openai", "gpt-4", {"tokens": 12})
+        manager.add_version(diagram_id, "add a cache", _xml(2), "anthropic", "claude-4")
+        saved = manager.get_history(diagram_id)
+        
+        loaded = DiagramHistoryManager(storage_dir).get_history(diagram_id)
+        
+        assert loaded.diagram_id == diagram_id
+        assert loaded.created_at == saved.created_at
+        assert loaded.updated_at == saved.updated_at
+        assert loaded.versions == saved.versions
+        assert loaded.versions[0].metadata == {"tokens": 12}
+    
+    def test_legacy_file_is_loaded_and_rewritten(self, manager, storage_dir):
+        """Older indented single-document files should load and be rewritten as NDJSON on the next save"""
+        history = DiagramHistory(diagram_id="legacy", created_at=datetime.now(), updated_at=datetime.now())
+        history.add_version("first", _xml(1), "openai", "gpt-4")
+        path = os.path.join(storage_dir, "legacy.json")
+        with open(path, "w") as f:
+            json.dump(history.to_dict(), f, indent=2)
+        
+        loaded = manager.get_history("legacy")
+        assert loaded.versions == history.versions
+        
+        assert manager.add_version("legacy", "second", _xml(2), "openai", "gpt-4")
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+        assert "versions" not in header
+        assert [v.xml_content for v in DiagramHistoryManager(storage_dir).get_history("legacy").versions] == [_xml(1), _xml(2)]
+    
+    def test_zero_version_history(self, manager, storage_dir):
+        """A history without versions should round-trip, list and count as empty"""
+        history = DiagramHistory(diagram_id="empty", created_at=datetime.now(), updated_at=datetime.now())
+        manager._save_diagram(history)
+        
+        loaded = DiagramHistoryManager(storage_dir).get_history("empty")
+        assert loaded.versions == []
+        assert loaded.get_latest_version() is None
+        
+        fresh = DiagramHistoryManager(storage_dir)
+        [row] = fresh.list_diagrams()
+        assert row["version_count"] == 0
+        assert row["latest_prompt"] == ""
+        assert fresh.get_stats()["total_versions"] == 0
+    
+    def test_list_mixes_old_and_new_files(self, manager, storage_dir):
+        """Listing and stats should handle NDJSON files next to older layouts, including CRLF line endings"""
+        new_id = manager.create_diagram("new", _xml(1), "openai", "gpt-4")
+        manager.add_version(new_id, "newer", _xml(2), "openai", "gpt-4")
+        
+        for name, indent, newline in (("indented", 2, "\n"), ("windows", 2, "\r\n"), ("compact", None, "\n")):
+            history = DiagramHistory(diagram_id=name, created_at=datetime.now(), updated_at=datetime.now())
+            for n in range(3):
+                history.add_version(f"{name} {n}", _xml(n), "anthropic", "claude-4")
+            with open(os.path.join(storage_dir, f"{name}.json"), "w", newline=newline) as f:
+                json.dump(history.to_dict(), f, indent=indent)
+        
+        fresh = DiagramHistoryManager(storage_dir)
+        rows = {row["diagram_id"]: row for row in fresh.list_diagrams()}
+        
+        assert set(rows) == {new_id, "indented", "windows", "compact"}
+        assert rows[new_id]["version_count"] == 2
+        assert rows[new_id]["latest_prompt"] == "newer"
+        for name in ("indented", "windows", "compact"):
+            assert rows[name]["version_count"] == 3
+            assert rows[name]["latest_prompt"] == f"{name} 2"
+        assert DiagramHistoryManager(storage_dir).get_stats()["total_versions"] == 11
+    
+    def test_save_swaps_in_temp_file(self, manager, storage_dir):
+        """Saves go through a .tmp file, and a failed swap leaves the old file intact"""
+        diagram_id = manager.create_diagram("a web app", _xml(1), "openai", "gpt-4")
+        path = os.path.join(storage_dir, f"{diagram_id}.json")
+        assert os.listdir(storage_dir) == [f"{diagram_id}.json"]
+        with open(path, "rb") as f:
+            before = f.read()
+        
+        with patch("backend.diagram_history.os.replace", side_effect=OSError("disk full")) as mock_replace:
+            with pytest.raises(OSError):
+                manager.add_version(diagram_id, "add a cache", _xml(2), "openai", "gpt-4")
+            mock_replace.assert_called_once_with(f"{path}.tmp", path)
+        
+        with open(path, "rb") as f:
+            assert f.read() == before
+        assert len(DiagramHistoryManager(storage_dir).get_history(diagram_id).versions) == 1
+
+
+class TestDeltaCompression:
+    """Test version XML stored compressed against the previous version"""
+    
+    @pytest.fixture
+    def storage_dir(self, tmp_path):
+        return str(tmp_path)
+    
+    @pytest.fixture
+    def manager(self, storage_dir):
+        return DiagramHistoryManager(storage_dir)
+    
+    def test_round_trip_past_max_versions(self, manager, storage_dir):
+        """Trimming to MAX_VERSIONS must not break the delta chain of the versions kept"""
+        total = MAX_VERSIONS + 10
+        diagram_id = manager.create_diagram("v0", _xml(0), "openai", "gpt-4")
+        for n in range(1, total):
+            manager.add_version(diagram_id, f"v{n}", _xml(n), "openai", "gpt-4")
+        
+        loaded = DiagramHistoryManager(storage_dir).get_history(diagram_id)
+        
+        assert len(loaded.versions) == MAX_VERSIONS
+        assert [v.xml_content for v in loaded.versions] == [_xml(n) for n in range(total - MAX_VERSIONS, total)]
+        assert [v.prompt for v in loaded.versions] == [f"v{n}" for n in range(total - MAX_VERSIONS, total)]
+    
+    def test_xml_larger_than_dictionary_window(self, manager, storage_dir):
+        """XML past zlib's 32 KiB window must still decode exactly"""
+        first, second = _large_xml(1), _large_xml(2)
+        assert len(first) > 32 * 1024
+        diagram_id = manager.create_diagram("big", first, "openai", "gpt-4")
+        manager.add_version(diagram_id, "bigger", second, "openai", "gpt-4")
+        
+        loaded = DiagramHistoryManager(storage_dir).get_history(diagram_id)
+        
+        assert [v.xml_content for v in loaded.versions] == [first, second]
+    
+    def test_mixed_plain_and_delta_lines(self, manager, storage_dir):
+        """Plain xml_content lines reset the chain that later xml_delta lines build on"""
+        now = datetime.now().isoformat()
+        xmls = [_xml(n) for n in range(4)]
+        lines = [{"diagram_id": "mixed", "created_at": now, "updated_at": now}]
+        for n, xml in enumerate(xmls):
+            record = {"id": f"v{n}", "timestamp": now, "prompt": f"p{n}", "provider": "openai", "model": "gpt-4"}
+            if n % 2 == 0:
+                record["xml_content"] = xml
+            else:
+                record["xml_delta"] = _delta_encode(xml.encode(), xmls[n - 1].encode())
+            lines.append(record)
+        with open(os.path.join(storage_dir, "mixed.json"), "w") as f:
+            f.write("\n".join(json.dumps(line) for line in lines))
+        
+        loaded = manager.get_history("mixed")
+        
+        assert [v.xml_content for v in loaded.versions] == xmls
+        assert manager.get_stats()["total_versions"] == 4
@@ -0,0 +1,111 @@
+"""
+Test suite for file processing
+
+Tests image metadata against PIL and parallel PDF text extraction.
+"""
+
+import io
+import fitz
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from backend import file_processor
+from backend.file_processor import FileProcessor, PARALLEL_PDF_PAGES
+
+
+def _encode(mode: str, fmt: str, size=(37, 21), **save_args) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, fmt, **save_args)
+    return buffer.getvalue()
+
+
+def _exif() -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = "Arcgen"  # Make
+    return exif.tobytes()
+
+
+def _pil_header(data: bytes):
+    image = Image.open(io.BytesIO(data))
+    return (*image.size, image.format, image.mode)
+
+
+class TestImageMetadata:
+    """Test reading image metadata from the header alone"""
+    
+    @pytest.fixture
+    def processor(self):
+        return FileProcessor()
+    
+    @pytest.mark.parametrize("data, content_type", [
+        (_encode("RGB", "JPEG"), "image/jpeg"),
+        (_encode("RGB", "JPEG", progressive=True), "image/jpeg"),
+        (_encode("RGB", "JPEG", exif=_exif()), "image/jpeg"),
+        (_encode("CMYK", "JPEG"), "image/jpeg"),
+        (_encode("P", "PNG"), "image/png"),
+        (_encode("RGBA", "PNG"), "image/png"),
+        (_encode("I;16", "PNG"), "image/png"),
+        (_encode("P", "GIF"), "image/gif"),
+        (_encode("RGB", "WEBP"), "image/webp"),
+    ], ids=["jpeg", "jpeg-progressive", "jpeg-exif", "jpeg-cmyk", "png-p", "png-rgba", "png-16-bit", "gif", "webp"])
+    def test_metadata_matches_pil(self, processor, data, content_type):
+        metadata = processor.process_file(data, "upload")["metadata"]
+        
+        assert (metadata["width"], metadata["height"], metadata["format"], metadata["mode"]) == _pil_header(data)
+        assert metadata["has_alpha"] == (metadata["mode"] in ("RGBA", "LA", "P"))
+    
+    def test_content_type_limits_formats(self, processor):
+        """Only the sniffed format is tried, so a PNG labelled as JPEG is rejected"""
+        with pytest.raises(ValueError, match="Failed to process image"):
+            processor._process_image(_encode("RGB", "PNG"), "upload.jpg", "image/jpeg")
+    
+    def test_truncated_header(self, processor):
+        with pytest.raises(ValueError, match="Failed to process image"):
+            processor.process_file(_encode("RGB", "PNG")[:20], "upload.png")
+
+
+def _pdf(page_count: int, image_page: int) -> bytes:
+    """A PDF with numbered pages and one image, placed on image_page"""
+    png = _encode("RGB", "PNG", size=(4, 4))
+    with fitz.open() as doc:
+        for n in range(page_count):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Section {n} describes service {n}")
+            if n == image_page:
+                page.insert_image(fitz.Rect(72, 100, 144, 172), stream=png)
+        return doc.tobytes()
+
+
+class TestParallelPdf:
+    """Test that sharding PDF pages across processes matches the serial read"""
+    
+    @pytest.fixture
+    def two_workers(self):
+        with patch.object(file_processor, "_PDF_WORKERS", 2):
+            yield
+        file_processor.shutdown_pdf_pool()
+    
+    @pytest.mark.parametrize("image_page", [None, 0, PARALLEL_PDF_PAGES + 5])
+    def test_parallel_matches_serial(self, two_workers, image_page):
+        """Page order and has_images must not depend on which shard a page lands in"""
+        page_count = PARALLEL_PDF_PAGES + 7
+        data = _pdf(page_count, image_page)
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            serial = file_processor._read_pages(doc, 0, page_count)
+        
+        assert file_processor._read_pages_parallel(data, page_count) == serial
+        assert serial[1] is (image_page is not None)
+        
+        result = FileProcessor().process_file(data, "spec.pdf")
+        assert result["extracted_text"] == "\n\n".join(serial[0])
+        assert result["has_images"] is serial[1]
+    
+    def test_shutdown_pdf_pool(self, two_workers):
+        """The pool is created on first use and released by shutdown_pdf_pool"""
+        data = _pdf(PARALLEL_PDF_PAGES, None)
+        file_processor._read_pages_parallel(data, PARALLEL_PDF_PAGES)
+        assert file_processor._pdf_pool is not None
+        
+        file_processor.shutdown_pdf_pool()
+        assert file_processor._pdf_pool is None
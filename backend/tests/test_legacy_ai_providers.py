@@ -0,0 +1,78 @@
+"""
+Test suite for the legacy single-module provider system
+
+backend/ai_providers.py is shadowed by the ai_providers package, so it is
+loaded from its path with the tools package's old API stubbed out.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import importlib.util
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai_providers.py")
+
+
+@pytest.fixture(scope="module")
+def legacy():
+    tools = ModuleType("tools")
+    tools.get_tools_for_ai = MagicMock(return_value=[])
+    tools.validate_tool_call = MagicMock(return_value=True)
+    tools.shape_library_manager = MagicMock()
+    tools.shape_library_manager.get_library_info.side_effect = lambda library: {"name": library}
+    spec = importlib.util.spec_from_file_location("legacy_ai_providers", _PATH)
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"tools": tools}):
+        spec.loader.exec_module(module)
+    return module
+
+
+def _openai_call(name, **args):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=json.dumps(args)))
+
+
+class TestToolCalls:
+    """Test handling every tool call in a response"""
+    
+    def test_single_call_keeps_its_shape(self, legacy):
+        result = asyncio.run(legacy.ai_provider_manager._process_tool_calls([
+            _openai_call("display_diagram", xml="<mxCell/>"),
+        ]))
+        assert result == {"type": "display_diagram", "xml": "<mxCell/>"}
+    
+    def test_batch_keeps_call_order(self, legacy):
+        """Every call is handled and results come back in the order they were made"""
+        result = asyncio.run(legacy.ai_provider_manager._process_tool_calls([
+            _openai_call("get_shape_library", library="aws4"),
+            _openai_call("display_diagram", xml="<mxCell id=\"1\"/>"),
+            _openai_call("unknown_tool"),
+            _openai_call("edit_diagram", edits=[{"search": "a", "replace": "b"}]),
+        ]))
+        assert result == {"type": "batch", "ops": [
+            {"type": "shape_library", "library": "aws4", "info": {"name": "aws4"}},
+            {"type": "display_diagram", "xml": "<mxCell id=\"1\"/>"},
+            {"type": "edit_diagram", "edits": [{"search": "a", "replace": "b"}]},
+        ]}
+    
+    def test_failing_call_is_isolated(self, legacy):
+        """A call with bad arguments becomes an error op; the others still run"""
+        content = [
+            SimpleNamespace(type="text", text="Here you go"),
+            SimpleNamespace(type="tool_use", name="append_diagram", input={}),
+            SimpleNamespace(type="tool_use", name="append_diagram", input={"xml": "<mxCell/>"}),
+        ]
+        result = asyncio.run(legacy.ai_provider_manager._process_anthropic_tool_calls(content))
+        
+        assert result["type"] == "batch"
+        error, appended = result["ops"]
+        assert error["type"] == "error" and error["tool"] == "append_diagram"
+        assert appended == {"type": "append_diagram", "xml": "<mxCell/>"}
+    
+    def test_no_calls(self, legacy):
+        result = asyncio.run(legacy.ai_provider_manager._process_anthropic_tool_calls([]))
+        assert result == {"type": "text", "content": "No tool calls found"}